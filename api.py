@@ -1,15 +1,58 @@
 #api.py
-from fastapi import FastAPI, UploadFile, File
+import time
+_import_start = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+from fastapi.responses import StreamingResponse, JSONResponse
+from email.utils import formatdate, parsedate_to_datetime
+import asyncio
+import hashlib
+import json
+import math
 from pydantic import BaseModel
-from scheduler import solve_schedule, swap_shift
-from arai_rag import answer_question
-from jai_agent import get_growth_path, get_weekly_nudge, get_skill_tree
-from kai_agent import submit_idea, upvote_idea, view_challenge, post_kudos, manager_summary
+from typing import Optional
+import metrics
+import runtime
+
+# Heavy subsystems (pandas, Chroma/OpenAI, the agents) are imported on first use
+# through runtime.get(...), optionally warmed up in the background at startup,
+# so a broken Chroma only takes down the Arai endpoints.
+def scheduling():
+    return runtime.get("scheduler")
+
+def schedule_store():
+    return runtime.get("scheduler", "schedule_store").store
+
+def schedule_upload():
+    return runtime.get("scheduler", "schedule_upload")
+
+def schedule_format():
+    return runtime.get("scheduler", "schedule_format")
+
+def arai():
+    return runtime.get("arai")
+
+def jai():
+    return runtime.get("jai")
+
+def kai():
+    return runtime.get("kai")
 
+def kai_store():
+    return runtime.get("kai", "kai_store").get_store()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    runtime.warm_up()
+    yield
+    runtime.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,67 +62,284 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# /preview: reject an oversized upload from its Content-Length, before the body is spooled
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    length = request.headers.get("content-length", "")
+    if request.method == "POST" and request.url.path == "/preview" and length.isdigit():
+        upload = schedule_upload()
+        if int(length) > upload.UPLOAD_MAX_BYTES + upload.MULTIPART_SLACK:
+            return JSONResponse(status_code=413, content={"detail": f"File is larger than {upload.UPLOAD_MAX_BYTES} bytes"})
+    return await call_next(request)
+
+# request latency per route template (e.g. /schedules/{schedule_id}), exposed on /metrics
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_LATENCY.labels(
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        ).observe(time.perf_counter() - start)
+
 # ---------- Arai ----------
 class QueryRequest(BaseModel):
     question: str
     style: str = "bullet"
+    mode: Optional[str] = None   # retrieval: "vector" / "hybrid" / "lexical" (default from ARAI_RETRIEVAL_MODE)
+    manual: Optional[str] = None  # limit to one manual, e.g. "FAN_Manual"
 
 @app.post("/ask_arai")
 def ask_arai(req: QueryRequest):
     try:
-        ans, sources = answer_question(req.question, style=req.style)
-        return {"answer": ans, "sources": sources}
+        # path: "llm", "extractive" (no LLM call), "extractive_fallback", "cache" or "refusal"
+        return arai().answer_question_detailed(req.question, style=req.style, mode=req.mode, manual=req.manual)
     except Exception as e:
         return {"error": str(e)}
 
+class BatchQueryRequest(BaseModel):
+    questions: list[str]
+    style: str = "bullet"
+    mode: Optional[str] = None
+    manual: Optional[str] = None
+
+# Many questions in one call (quiz / FAQ tools): one embedding request, one
+# vector search, bounded parallel completions. Results in input order, errors per item.
+@app.post("/ask_arai/batch")
+def ask_arai_batch(req: BatchQueryRequest):
+    rag = arai()
+    if len(req.questions) > rag.BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {rag.BATCH_MAX_QUESTIONS} questions per batch")
+    try:
+        results = rag.answer_questions(req.questions, style=req.style, mode=req.mode, manual=req.manual)
+        return {"results": results}
+    except Exception as e:
+        return {"error": str(e)}
+
+# Async + server-sent events: bullets are sent as soon as each one is complete
+@app.post("/ask_arai/stream")
+async def ask_arai_stream(req: QueryRequest):
+    async def events():
+        try:
+            async for event in arai().astream_answer(req.question, style=req.style, mode=req.mode, manual=req.manual):
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/arai/cache_stats")
+def arai_cache_stats():
+    return arai().answer_cache.stats()
+
 
 # ---------- Oai ----------
-# Preview CSV
+# Preview CSV (or legacy .xls): parsed + validated in a worker thread, bounded by
+# UPLOAD_MAX_BYTES / UPLOAD_MAX_ROWS. Returns the first rows, stats and a token
+# that /generate_schedule accepts instead of the full availability.
 @app.post("/preview")
 async def preview_csv(file: UploadFile = File(...)):
-    df = pd.read_csv(file.file)
-    return {"preview": df.to_dict(orient="records")}
+    upload = schedule_upload()
+    if file.size is not None and file.size > upload.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File is larger than {upload.UPLOAD_MAX_BYTES} bytes")
+    try:
+        df = await asyncio.to_thread(upload.parse_upload, file.file, file.filename)
+    except upload.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except upload.UploadError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "errors": e.errors})
+    return upload.preview(df)
+
+def availability_frame(data):
+    """Availability from the request body, or from an earlier /preview upload via availability_token"""
+    import pandas as pd
+    if data.get("availability_token"):
+        df = schedule_upload().uploads.get(data["availability_token"])
+        if df is None:
+            raise HTTPException(status_code=404, detail="Availability token not found or expired")
+        return df
+    if "availability" not in data:
+        raise HTTPException(status_code=400, detail="Send availability or availability_token")
+    return pd.DataFrame(data["availability"])
+
+def solver_options(data, sched):
+    """mode / time_budget from the request body, checked before anything is solved"""
+    mode = data.get("mode", sched.DEFAULT_MODE)
+    time_budget = data.get("time_budget", sched.DEFAULT_TIME_BUDGET)
+    if mode not in sched.MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(sched.MODES)}")
+    if isinstance(time_budget, bool) or not isinstance(time_budget, (int, float)) \
+            or not math.isfinite(time_budget) or time_budget <= 0:
+        raise HTTPException(status_code=400, detail="time_budget must be a positive number of seconds")
+    return mode, time_budget
+
+# Schedule wire formats: ?format=dict (default, schedule.to_dict()) | compact |
+# bitset | arrow (or Accept: application/vnd.apache.arrow.stream, needs pyarrow)
+def requested_format(request, data=None):
+    fmt = request.query_params.get("format") or (data or {}).get("format")
+    if not fmt and schedule_format().ARROW_MEDIA_TYPE in request.headers.get("accept", ""):
+        fmt = "arrow"
+    fmt = fmt or schedule_format().DEFAULT_FORMAT
+    if fmt not in schedule_format().FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format: {fmt}")
+    return fmt
+
+def schedule_response(request, body, data=None):
+    """body["schedule"] (a DataFrame) encoded in the requested format"""
+    fmt_mod = schedule_format()
+    fmt = requested_format(request, data)
+    schedule = body["schedule"]
+    if fmt == "arrow":
+        try:
+            payload = fmt_mod.to_arrow(schedule, metadata={k: v for k, v in body.items() if k != "schedule"})
+        except ImportError:
+            raise HTTPException(status_code=406, detail="Arrow output needs pyarrow on the server")
+        return Response(payload, media_type=fmt_mod.ARROW_MEDIA_TYPE)
+    body["schedule"] = fmt_mod.encode_schedule(schedule, fmt)
+    if fmt == "dict":
+        return body
+    return Response(fmt_mod.dumps(body), media_type="application/json")
 
 # Generate Schedule
 @app.post("/generate_schedule")
-def generate(data: dict):
-    df = pd.DataFrame(data["availability"])
-    schedule = solve_schedule(df)
-    return {"schedule": schedule.to_dict()}
+def generate(request: Request, data: dict):
+    sched = scheduling()
+    df = availability_frame(data)
+    # mode: "greedy" (default) or "optimal"; time_budget in seconds for "optimal"
+    mode, time_budget = solver_options(data, sched)
+    schedule, stats = sched.solve_schedule_detailed(df, mode=mode, time_budget=time_budget, seed=data.get("seed"))
+    schedule_id = schedule_store().create(df, schedule)
+    return schedule_response(request, {"schedule_id": schedule_id, "schedule": schedule, "stats": stats}, data)
+
+# Generate schedules for many branches at once, streamed back as NDJSON
+# (one line per branch, in completion order)
+@app.post("/generate_schedule_batch")
+def generate_batch(request: Request, data: dict):
+    sched = scheduling()
+    fmt_mod = schedule_format()
+    fmt = requested_format(request, data)
+    if fmt == "arrow":
+        raise HTTPException(status_code=400, detail="Batch results are NDJSON: use format dict, compact or bitset")
+    max_workers = data.get("max_workers", sched.SCHEDULE_WORKERS)
+    # checked here: once the stream has started an error can only be a line in it
+    if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 1:
+        raise HTTPException(status_code=400, detail="max_workers must be a positive integer")
+    mode, time_budget = solver_options(data, sched)
+    for b in data["branches"]:
+        if isinstance(b, dict):
+            # a branch may override mode / time_budget
+            b["mode"], b["time_budget"] = solver_options({"mode": mode, "time_budget": time_budget, **b}, sched)
+        if isinstance(b, dict) and b.get("availability_token"):
+            # an expired token leaves the branch without availability -> per-branch error
+            df = schedule_upload().uploads.get(b["availability_token"])
+            if df is not None:
+                b["availability"] = df.to_dict()
+
+    def results():
+        for res in sched.solve_branches(
+            data["branches"],
+            max_workers=max_workers,
+            mode=mode,
+            time_budget=time_budget,
+            seed=data.get("seed"),
+        ):
+            if "error" not in res:
+                res["schedule_id"] = schedule_store().create(res.pop("availability"), res["schedule"])
+                res["schedule"] = fmt_mod.encode_schedule(res["schedule"], fmt)
+            yield fmt_mod.dumps(res) + b"\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 @app.post("/swap_shift")
-def swap_shift_api(data: dict):
-    schedule = pd.DataFrame(data["schedule"])
+def swap_shift_api(request: Request, data: dict):
+    import pandas as pd
+    schedule = schedule_format().decode_schedule(data["schedule"])  # any JSON format
     emp1 = data["emp1"]
     emp2 = data["emp2"]
     shift = data["shift"]
     availability = pd.DataFrame(data["availability"])  # 👈 เอา preview มาด้วย
 
-    success, new_schedule = swap_shift(schedule, emp1, emp2, shift, availability)
+    success, new_schedule = scheduling().swap_shift(schedule, emp1, emp2, shift, availability)
 
     if success:
-        return {"success": True, "schedule": new_schedule.to_dict()}
+        return schedule_response(request, {"success": True, "schedule": new_schedule}, data)
     return {"success": False, "message": "Swap not allowed (availability or schedule mismatch)"}
 
 # Reset Schedule
 @app.post("/reset_schedule")
 def reset(data: dict):
+    import pandas as pd
     original = pd.DataFrame(data["original"])
     return {"schedule": original.to_dict()}
 
 
+# ---------- Schedule sessions (by schedule_id, delta responses) ----------
+def get_session(schedule_id):
+    session = schedule_store().get(schedule_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Schedule not found or expired")
+    return session
+
+@app.get("/schedules/{schedule_id}")
+def get_schedule(request: Request, schedule_id: str):
+    return schedule_response(request, {"schedule_id": schedule_id, "schedule": get_session(schedule_id).to_frame()})
+
+@app.post("/schedules/{schedule_id}/swap")
+def swap_session_shift(schedule_id: str, data: dict):
+    success, changes = get_session(schedule_id).swap(data["emp1"], data["emp2"], data["shift"])
+    if success:
+        return {"success": True, "changes": changes}
+    return {"success": False, "message": "Swap not allowed (availability or schedule mismatch)"}
+
+@app.post("/schedules/{schedule_id}/swaps")
+def swap_session_shifts(schedule_id: str, data: dict):
+    session = get_session(schedule_id)
+    results, changes = [], []
+    for sw in data["swaps"]:
+        success, cells = session.swap(sw["emp1"], sw["emp2"], sw["shift"])
+        results.append(success)
+        changes.extend(cells)
+    return {"results": results, "changes": changes}
+
+@app.post("/schedules/{schedule_id}/reset")
+def reset_session(schedule_id: str):
+    return {"changes": get_session(schedule_id).reset()}
+
+@app.delete("/schedules/{schedule_id}")
+def delete_session(schedule_id: str):
+    return {"deleted": schedule_store().delete(schedule_id)}
+
+
 # ---------- ๋Jai ----------
 @app.get("/jai/growth/{emp_id}")
 def jai_growth(emp_id: int):
-    return {"result": get_growth_path(emp_id)}
+    return {"result": jai().get_growth_path(emp_id)}
 
 @app.get("/jai/nudge/{emp_id}")
 def jai_nudge(emp_id: int):
-    return {"result": get_weekly_nudge(emp_id)}
+    return {"result": jai().get_weekly_nudge(emp_id)}
 
 @app.get("/jai/skills/{emp_id}")
 def jai_skills(emp_id: int):
-    return {"result": get_skill_tree(emp_id)}
+    return {"result": jai().get_skill_tree(emp_id)}
+
+@app.get("/jai/team/growth")
+def jai_team_growth(role: Optional[str] = None, ready: Optional[bool] = None):
+    employees = jai().get_team_growth(role=role, ready=ready)
+    return {"count": len(employees), "employees": employees}
+
+@app.get("/jai/team/nudges")
+def jai_team_nudges(role: Optional[str] = None):
+    nudges = jai().get_team_nudges(role=role)
+    return {"count": len(nudges), "nudges": nudges}
 
 # ---------- Kai ----------
 from pydantic import BaseModel
@@ -91,15 +351,15 @@ class IdeaRequest(BaseModel):
 
 @app.post("/kai/idea")
 def kai_submit(req: IdeaRequest):
-    return {"result": submit_idea(req.idea_text, req.employee, req.branch)}
+    return {"result": kai().submit_idea(req.idea_text, req.employee, req.branch)}
 
 @app.post("/kai/upvote/{idea_id}")
 def kai_upvote_api(idea_id: int):
-    return {"result": upvote_idea(idea_id)}
+    return {"result": kai().upvote_idea(idea_id)}
 
 @app.get("/kai/challenge")
 def kai_challenge():
-    return {"result": view_challenge()}
+    return {"result": kai().view_challenge()}
 
 class KudosRequest(BaseModel):
     from_emp: str
@@ -108,28 +368,110 @@ class KudosRequest(BaseModel):
 
 @app.post("/kai/kudos")
 def kai_kudos(req: KudosRequest):
-    return {"result": post_kudos(req.from_emp, req.to_emp, req.message)}
+    return {"result": kai().post_kudos(req.from_emp, req.to_emp, req.message)}
 
 @app.get("/kai/summary")
 def kai_summary():
-    return {"result": manager_summary()}
+    data = kai().manager_summary_data()
+    return {"result": kai().manager_summary(data), "summary": data}
 
-@app.get("/kai/ideas")
-def kai_ideas():
+def cached_listing(request, store, build):
+    """
+    Conditional GET for the Kai listings: the ETag / Last-Modified come from the
+    store's change version (plus the query), so an unchanged poll is answered
+    with 304 before any rows are read.
+    """
+    version, updated_at = store.version()
+    query = hashlib.md5(str(request.url.query).encode()).hexdigest()[:8]
+    etag = f'W/"{version}-{query}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            if int(updated_at) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
     try:
-        df = pd.read_csv("ideas.csv")
-        return {"ideas": df.to_dict(orient="records")}
-    except FileNotFoundError:
-        return {"ideas": []}
+        body = build()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(jsonable_encoder(body), headers=headers)
 
-KUDOS_FILE = "kudos.csv"
+# since / until: epoch seconds or a date(-time) string; cursor: "next_cursor" of the previous page
+# (limit defaults to 50 once any parameter is given; none at all = the full list, as before)
+@app.get("/kai/ideas")
+def kai_ideas(request: Request, branch_id: Optional[str] = None, submitted_by: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None, sort: Optional[str] = None,
+              cursor: Optional[str] = None, limit: Optional[int] = None):
+    store = kai_store()
+    # no query parameters at all: the old response, every idea by idea_id
+    legacy = all(v is None for v in (branch_id, submitted_by, since, until, sort, cursor, limit))
+
+    def build():
+        if legacy:
+            return {"ideas": store.list_ideas(), "next_cursor": None}
+        ideas, next_cursor = store.query_ideas(branch_id=branch_id, submitted_by=submitted_by, since=since,
+                                               until=until, sort=sort or "recent", cursor=cursor,
+                                               limit=50 if limit is None else limit)
+        return {"ideas": ideas, "next_cursor": next_cursor}
+
+    return cached_listing(request, store, build)
 
 @app.get("/kai/kudos_list")
-def kai_kudos_list():
-    try:
-        df = pd.read_csv(KUDOS_FILE)
-        # แปลงเป็น dict list
-        records = df.to_dict(orient="records")
-        return {"kudos": records}
-    except Exception as e:
-        return {"error": str(e), "kudos": []}
+def kai_kudos_list(request: Request, from_employee: Optional[str] = None, to_employee: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None, sort: Optional[str] = None,
+                   cursor: Optional[str] = None, limit: Optional[int] = None):
+    store = kai_store()
+    legacy = all(v is None for v in (from_employee, to_employee, since, until, sort, cursor, limit))
+
+    def build():
+        if legacy:
+            return {"kudos": store.list_kudos(), "next_cursor": None}
+        kudos, next_cursor = store.query_kudos(from_employee=from_employee, to_employee=to_employee, since=since,
+                                               until=until, sort=sort or "recent", cursor=cursor,
+                                               limit=50 if limit is None else limit)
+        return {"kudos": kudos, "next_cursor": next_cursor}
+
+    return cached_listing(request, store, build)
+
+# Ideas (new or upvoted) and kudos written after change number `since`;
+# start with since=0 and pass back the returned "seq"
+@app.get("/kai/changes")
+def kai_changes(request: Request, since: int = 0, limit: int = 500):
+    store = kai_store()
+    return cached_listing(request, store, lambda: store.changes(since=since, limit=limit))
+
+
+# ---------- Health ----------
+@app.get("/livez")
+def livez():
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    ready, required = runtime.readiness()
+    if not ready:
+        # nothing warming these up (e.g. WARMUP=""): start loading so a later probe succeeds
+        runtime.warm_up([n for n in required if runtime.SUBSYSTEMS[n].state == "idle"])
+    body = {"ready": ready, "required": required, "subsystems": runtime.status()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/startupz")
+def startupz():
+    return runtime.startup_report()
+
+# Prometheus text format: route latency, Arai stage timings, tokens, top score, outcomes
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+runtime.startup_timings["import api"] = round(time.perf_counter() - _import_start, 4)
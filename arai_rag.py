@@ -1,12 +1,49 @@
 # arai_rag.py
-import chromadb
-chromadb.config.telemetry = False
 import os
-from openai import OpenAI
+import json
+import asyncio
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import chromadb.segment.impl.metadata.sqlite as sqlite_module
-from chromadb.utils import embedding_functions
+import metrics
+from semantic_cache import SemanticCache
+from lexical_index import BM25Index
+from vector_index import VectorIndex
+from manual_text import split_sentences, prepare_section, section_title
+
+# ---------------- CONFIG ----------------
+PERSIST_DIR = "./chroma_db"
+COLLECTION_NAME = "fan_manual"
+TOP_K = 5
+CHAT_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+# written by data_ingest.py after every rebuild; a new mtime invalidates the answer cache
+INGEST_STAMP_FILE = os.path.join(PERSIST_DIR, f"{COLLECTION_NAME}.stamp")
+CACHE_ENABLED = os.getenv("ARAI_CACHE_ENABLED", "1") == "1"
+CACHE_THRESHOLD = float(os.getenv("ARAI_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+CACHE_MAX_SIZE = int(os.getenv("ARAI_CACHE_SIZE", "512"))
+CACHE_TTL_SECONDS = float(os.getenv("ARAI_CACHE_TTL", "3600"))
+# retrieval: "vector" (Chroma only), "hybrid" (BM25 + vector) or "lexical" (BM25 only, no embedding call)
+BM25_INDEX_FILE = os.path.join(PERSIST_DIR, f"{COLLECTION_NAME}_bm25.json")
+RETRIEVAL_MODE = os.getenv("ARAI_RETRIEVAL_MODE", "hybrid")
+HYBRID_ALPHA = float(os.getenv("ARAI_HYBRID_ALPHA", "0.5"))  # weight of the vector score
+SECTIONS_FILE = os.path.join(PERSIST_DIR, f"{COLLECTION_NAME}_sections.json")  # written by data_ingest.py
+# vector search: "chroma" or "numpy" (exact search over the embeddings exported by data_ingest.py)
+VECTOR_BACKEND = os.getenv("ARAI_VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_PREFIX = os.path.join(PERSIST_DIR, f"{COLLECTION_NAME}_vectors")
+# refuse when no retrieved section is closer than this vector distance (0..2)
+REFUSAL_DISTANCE = float(os.getenv("ARAI_REFUSAL_DISTANCE", "1.5"))
+# extractive fast path: when the best hit's vector distance (0..2, lower is better) is below
+# this, the answer is built from the section's pre-split sentences without an LLM call.
+# Fused hybrid / BM25 scores are not compared: lexical-only hits always go to the LLM.
+# (0 = always use the LLM)
+EXTRACTIVE_THRESHOLD = float(os.getenv("ARAI_EXTRACTIVE_THRESHOLD", "0.6"))
+# batch answering (answer_questions / POST /ask_arai/batch)
+BATCH_MAX_QUESTIONS = int(os.getenv("ARAI_BATCH_MAX", "64"))
+BATCH_CONCURRENCY = int(os.getenv("ARAI_BATCH_CONCURRENCY", "8"))   # completions in flight
+# ----------------------------------------
 
 # ----------- PATCH SQLITE DECODE -----------
 def safe_decode_seq_id(seq_id_bytes):
@@ -16,61 +53,309 @@ def safe_decode_seq_id(seq_id_bytes):
         if len(seq_id_bytes) in (8, 24):
             return int.from_bytes(seq_id_bytes, "big")
     raise ValueError(f"Unexpected seq_id_bytes: {seq_id_bytes}")
-
-sqlite_module._decode_seq_id = safe_decode_seq_id
 # -------------------------------------------
 
-# ---------------- CONFIG ----------------
-PERSIST_DIR = "./chroma_db"
-COLLECTION_NAME = "fan_manual"
-TOP_K = 5
-# ----------------------------------------
+def open_chroma():
+    import chromadb
+    chromadb.config.telemetry = False
+    import chromadb.segment.impl.metadata.sqlite as sqlite_module
+    sqlite_module._decode_seq_id = safe_decode_seq_id
+    return chromadb.PersistentClient(path=PERSIST_DIR)
 
-# Init OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Filled in by init() on first use, so importing this module stays cheap
+client = None           # OpenAI (sync, answer_question)
+aclient = None          # AsyncOpenAI (streaming path)
+embedding_func = None
+chroma_client = None
+collection = None
+lexical_index = None
+vector_index = None     # VectorIndex when VECTOR_BACKEND == "numpy"
+prepared_sections = {}
+_ready = False
+_init_lock = threading.Lock()
 
-# Init embeddings & DB
-embedding_func = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=os.getenv("OPENAI_API_KEY"),
-    model_name="text-embedding-3-small"
-)
+def init():
+    """Create the OpenAI clients, open Chroma (or the numpy index) and load the ingest sidecars (once)"""
+    global client, aclient, embedding_func, chroma_client, collection, lexical_index, vector_index, prepared_sections, _ready
+    if _ready:
+        return
+    with _init_lock:
+        if _ready:
+            return
+        if VECTOR_BACKEND not in ("chroma", "numpy"):
+            raise ValueError(f"Unknown vector backend: {VECTOR_BACKEND}")
+        from chromadb.utils import embedding_functions
+        from openai import OpenAI, AsyncOpenAI
 
-chroma_client = chromadb.PersistentClient(path=PERSIST_DIR)
-collection = chroma_client.get_collection(
-    name=COLLECTION_NAME,
-    embedding_function=embedding_func
+        # Init OpenAI clients (sync for answer_question, async for the streaming path)
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        aclient = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+        # Init embeddings & DB
+        embedding_func = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            model_name=EMBEDDING_MODEL
+        )
+        if VECTOR_BACKEND == "numpy":
+            # no Chroma client / SQLite at all on this path
+            vector_index = VectorIndex.load(VECTOR_INDEX_PREFIX)
+        else:
+            chroma_client = open_chroma()
+            collection = chroma_client.get_collection(
+                name=COLLECTION_NAME,
+                embedding_function=embedding_func
+            )
+        lexical_index = load_lexical_index()
+        prepared_sections = load_sections()
+        _ready = True
+
+def load_lexical_index():
+    if not os.path.exists(BM25_INDEX_FILE):
+        return None
+    return BM25Index.load(BM25_INDEX_FILE)
+
+def load_sections():
+    if not os.path.exists(SECTIONS_FILE):
+        return {}
+    with open(SECTIONS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def reload_collection():
+    # the old handle points at a deleted collection once data_ingest.py has rebuilt it
+    global collection, lexical_index, vector_index, prepared_sections
+    if not _ready:
+        return   # init() will load the fresh one
+    if vector_index is not None:
+        vector_index = VectorIndex.load(VECTOR_INDEX_PREFIX)
+    else:
+        collection = chroma_client.get_collection(
+            name=COLLECTION_NAME,
+            embedding_function=embedding_func
+        )
+    lexical_index = load_lexical_index()
+    prepared_sections = load_sections()
+
+answer_cache = SemanticCache(
+    threshold=CACHE_THRESHOLD,
+    max_size=CACHE_MAX_SIZE,
+    ttl=CACHE_TTL_SECONDS,
+    stamp_path=INGEST_STAMP_FILE,
+    on_invalidate=reload_collection,
 )
 
 # ---------------- HELPERS ----------------
-def retrieve(query, top_k=TOP_K):
-    res = collection.query(
-        query_texts=[query],
-        n_results=top_k,
-        include=["documents", "metadatas", "distances"]
-    )
+def embed_query(query):
+    init()
+    with metrics.stage("embedding"):
+        return embedding_func([query])[0]
+
+def embed_queries(queries):
+    """All queries in one embedding request"""
+    init()
+    with metrics.stage("embedding"):
+        return embedding_func(list(queries))
+
+def manual_filter(manual):
+    return {"manual": manual} if manual else None
+
+def vector_retrieve(query, top_k=TOP_K, embedding=None, manual=None):
+    if embedding is None:
+        embedding = embed_query(query)
+    return vector_retrieve_many([embedding], top_k=top_k, manual=manual)[0]
+
+def vector_retrieve_many(embeddings, top_k=TOP_K, manual=None):
+    """One vector search (a single Chroma query / matrix product) for many query embeddings"""
+    init()
+    if vector_index is not None:
+        with metrics.stage("vector_query"):
+            found = vector_index.search_many(embeddings, top_k=top_k, where=manual_filter(manual))
+        return [[{
+            "id": vector_index.ids[i],
+            "text": vector_index.documents[i],
+            "meta": vector_index.metadatas[i],
+            "score": score,
+            "distance": score
+        } for i, score in row] for row in found]
+    with metrics.stage("vector_query"):
+        res = collection.query(
+            query_embeddings=[[float(x) for x in e] for e in embeddings],
+            n_results=top_k,
+            where=manual_filter(manual),
+            include=["documents", "metadatas", "distances"]
+        )
+    results = []
+    for q in range(len(embeddings)):
+        docs = []
+        for idx in range(len(res["documents"][q])):
+            docs.append({
+                "id": res["ids"][q][idx],
+                "text": res["documents"][q][idx],
+                "meta": res["metadatas"][q][idx],
+                "score": res["distances"][q][idx],
+                "distance": res["distances"][q][idx]
+            })
+        results.append(docs)
+    return results
+
+def lexical_retrieve(query, top_k=TOP_K, manual=None):
+    init()
+    # score is turned into a distance on the same 0..2 scale as the vector one
+    with metrics.stage("lexical_query"):
+        found = lexical_index.search(query, top_k=top_k, where=manual_filter(manual))
+    return [{
+        "id": lexical_index.ids[i],
+        "text": lexical_index.documents[i],
+        "meta": lexical_index.metadatas[i],
+        "score": 2 * (1 - rel),
+        "lexical": rel
+    } for i, rel in found]
+
+def hybrid_retrieve(query, top_k=TOP_K, embedding=None, alpha=HYBRID_ALPHA, manual=None):
+    """
+    Fuse vector and BM25 relevance: alpha * cosine + (1 - alpha) * bm25,
+    both in [0, 1]. Chroma's L2 distance on unit vectors is 2 - 2*cosine.
+    """
+    pool = max(top_k * 4, 20)
+    vec = vector_retrieve(query, top_k=pool, embedding=embedding, manual=manual)
+    lex = lexical_retrieve(query, top_k=pool, manual=manual)
+    return fuse_hits(vec, lex, top_k, alpha)
+
+def fuse_hits(vec, lex, top_k=TOP_K, alpha=HYBRID_ALPHA):
+    """hybrid_retrieve's fusion of one query's vector and BM25 hits"""
+    cosine = {h["id"]: 1 - h["score"] / 2 for h in vec}
+    floor = min(cosine.values()) if cosine else 0.0   # docs outside the vector pool
+    merged = {h["id"]: h for h in vec}
+    for h in lex:
+        merged.setdefault(h["id"], h)
+    lexical = {h["id"]: h["lexical"] for h in lex}
+    # best vector distance in the whole pool, even if that doc is not in the fused top_k (refusal)
+    nearest = min((h["distance"] for h in vec if h.get("distance") is not None), default=None)
+
     docs = []
-    for idx in range(len(res["documents"][0])):
-        docs.append({
-            "text": res["documents"][0][idx],
-            "meta": res["metadatas"][0][idx],
-            "score": res["distances"][0][idx]
+    for doc_id, h in merged.items():
+        fused = alpha * cosine.get(doc_id, floor) + (1 - alpha) * lexical.get(doc_id, 0.0)
+        docs.append({"id": doc_id, "text": h["text"], "meta": h["meta"], "score": 2 * (1 - fused),
+                     "distance": h.get("distance"),   # None outside the vector pool
+                     "nearest": nearest})
+    return sorted(docs, key=lambda h: h["score"])[:top_k]
+
+def merge_chunks(hits):
+    """
+    Collapse chunk hits of the same section into one hit (best score, chunks
+    in document order, overlapping sentences dropped). Keeps the best-first order.
+    """
+    groups, order = {}, []
+    for h in sorted(hits, key=lambda h: h["score"]):
+        sid = (h.get("meta") or {}).get("section_id") or h.get("id")
+        if sid not in groups:
+            groups[sid] = []
+            order.append(sid)
+        groups[sid].append(h)
+
+    merged = []
+    for sid in order:
+        group = groups[sid]
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+        group = sorted(group, key=lambda h: (h.get("meta") or {}).get("chunk_index", 0))
+        text, seen = group[0]["text"], set(split_sentences(group[0]["text"]))
+        heading = text.split("\n", 1)[0] + "\n"
+        for h in group[1:]:
+            body = h["text"][len(heading):] if h["text"].startswith(heading) else h["text"]
+            extra = [s for s in split_sentences(body) if s not in seen]
+            seen.update(extra)
+            if extra:
+                text += " " + " ".join(extra)
+        meta = {k: v for k, v in (group[0].get("meta") or {}).items() if k not in ("chunk_index", "hash")}
+        distances = [h["distance"] for h in group if h.get("distance") is not None]
+        merged.append({
+            "id": sid,
+            "text": text,
+            "meta": meta,
+            "score": min(h["score"] for h in group),
+            "distance": min(distances) if distances else None,
+            "nearest": group[0].get("nearest"),
+            "chunks": [h["id"] for h in group],
         })
-    return docs
+    return merged
 
-def split_sentences(text):
-    sents = re.split(r'(?<=[\.\!\?])\s+|(?=Step \d+:)', text.strip())
-    return [s.strip() for s in sents if s.strip()]
+def retrieve(query, top_k=TOP_K, embedding=None, mode=None, manual=None, merge=True):
+    """
+    Top sections for a query as [{id, text, meta, score}] (score: lower is better).
+    manual: only search that manual (file name without .pdf).
+    merge: fold chunks of one section back together (see merge_chunks).
+    """
+    init()
+    mode = mode or RETRIEVAL_MODE
+    if mode not in ("vector", "hybrid", "lexical"):
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    if mode != "vector" and lexical_index is None:
+        mode = "vector"   # no BM25 index persisted yet
+    # ask for extra chunks so that merging still leaves top_k sections
+    n = top_k * 2 if merge else top_k
+    if mode == "lexical":
+        hits = lexical_retrieve(query, top_k=n, manual=manual)
+    elif mode == "hybrid":
+        hits = hybrid_retrieve(query, top_k=n, embedding=embedding, manual=manual)
+    else:
+        hits = vector_retrieve(query, top_k=n, embedding=embedding, manual=manual)
+    return merge_chunks(hits)[:top_k] if merge else hits
 
-# ---------------- MAIN ANSWER ----------------
-def answer_question(query, style="bullet", top_k=TOP_K):
-    hits = retrieve(query, top_k=top_k)
+def retrieve_many(queries, top_k=TOP_K, embeddings=None, mode=None, manual=None, merge=True):
+    """
+    retrieve() for a list of queries: one embedding request and one vector
+    search for all of them (BM25 stays per query, it is local). Same hits per query.
+    """
+    init()
+    mode = mode or RETRIEVAL_MODE
+    if mode not in ("vector", "hybrid", "lexical"):
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    if mode != "vector" and lexical_index is None:
+        mode = "vector"
+    n = top_k * 2 if merge else top_k
+    if mode == "lexical":
+        results = [lexical_retrieve(q, top_k=n, manual=manual) for q in queries]
+    else:
+        if embeddings is None:
+            embeddings = embed_queries(queries)
+        if mode == "hybrid":
+            pool = max(n * 4, 20)
+            vec = vector_retrieve_many(embeddings, top_k=pool, manual=manual)
+            results = [fuse_hits(v, lexical_retrieve(q, top_k=pool, manual=manual), n)
+                       for q, v in zip(queries, vec)]
+        else:
+            results = vector_retrieve_many(embeddings, top_k=n, manual=manual)
+    return [merge_chunks(hits)[:top_k] if merge else hits for hits in results]
+
+def section_info(hit):
+    """Pre-split sentences / fallback text for a hit (computed on the fly if not ingested)"""
+    # merged multi-chunk hits are re-split from their merged text
+    info = None if len(hit.get("chunks") or []) > 1 else prepared_sections.get(hit.get("id"))
+    if info is None:
+        info = prepare_section(hit["text"], (hit.get("meta") or {}).get("title", ""))
+    return info
+
+# ---------------- ANSWER BUILDING ----------------
+REFUSAL = "Sorry, I cannot answer that because it’s not in the FAN manual."
+SYSTEM_PROMPT = "You are an accurate assistant for employees. ONLY use provided excerpts."
+SECTION_HEADER_PATTERN = re.compile(r"^\d+(\.\d+)*\s*[\.:]")
+
+def prepare_answer(query, hits, style="bullet"):
+    """
+    Everything before the LLM call: sort/dedup hits, pick the section,
+    extract its sentences and build the prompt.
+    Returns None when the manual has no relevant section.
+    """
     hits = sorted(hits, key=lambda h: h["score"])
 
-    # 🔎 Debug log
-    print("\n[DEBUG] Query:", query)
-    for h in hits:
-        title = (h.get("meta") or {}).get("title", "Unknown")
-        print(f" - {title} | score={h['score']:.3f}")
+    # 🔎 retrieval quality: top score histogram + hits in the sampled debug log
+    if hits:
+        metrics.TOP_SCORE.observe(hits[0]["score"])
+    metrics.annotate(
+        top_score=hits[0]["score"] if hits else None,
+        hits=[{"title": (h.get("meta") or {}).get("title", "Unknown"), "score": round(h["score"], 3)} for h in hits],
+    )
 
     # dedup
     seen_texts = set()
@@ -82,47 +367,32 @@ def answer_question(query, style="bullet", top_k=TOP_K):
             seen_texts.add(text)
     hits = unique_hits
 
-    # relax threshold → 1.5
-    if not hits or hits[0]["score"] > 1.5:
-        return "Sorry, I cannot answer that because it’s not in the FAN manual.", []
+    # relax threshold → 1.5, on the best vector distance (hybrid hits carry the pool's as
+    # "nearest") so hybrid refuses the same questions as vector mode and BM25 weighting only
+    # reorders; lexical mode has no distance and falls back to its score
+    if not hits:
+        return None
+    distances = [d for h in hits for d in (h.get("distance"), h.get("nearest")) if d is not None]
+    if (min(distances) if distances else hits[0]["score"]) > REFUSAL_DISTANCE:
+        return None
+
+    # exact-term matches (e.g. "refund") are ranked up by hybrid retrieval
+    target_section = hits[0]
+
+    # sentences are split / title-stripped / deduplicated at ingest time
+    info = section_info(target_section)
+    title = info["title"]
+    pieces = info["sentences"]
 
-    # keyword guardrail for refund/return
-    target_section = None
-    for h in hits:
-        meta = h.get("meta") or {}
-        title = meta.get("title", "").lower()
-        if any(kw in query.lower() for kw in ["refund", "return"]) and "refund" in title:
-            target_section = h
-            break
-    if not target_section:
-        target_section = hits[0]
-
-    extracted = []
-    if target_section:
-        sents = split_sentences(target_section["text"])
-        title = (target_section.get("meta") or {}).get("title", "").strip()
-        sents = [s for s in sents if s and s != title]
-        extracted.extend((0, s) for s in sents)
-
-    if not extracted and hits:
-        extracted = [(0, split_sentences(hits[0]["text"])[0])]
-
-    pieces, seen = [], set()
-    for hit_idx, s in extracted:
-        if s not in seen:
-            pieces.append((hit_idx, s))
-            seen.add(s)
-
-    title = (target_section.get("meta") or {}).get("title", "").strip()
     if style == "bullet":
         style_instr = (
             "Write the answer as Markdown bullet points. "
             "Each item should be on a new line. Do not invent extra steps."
         )
-        context_text = "\n".join(f"• {s}" for _, s in pieces if s and s != title)
+        context_text = "\n".join(f"• {s}" for s in pieces if s and s != title)
     else:
         style_instr = "Write the answer in 2-3 short paragraphs. Keep exact steps."
-        context_text = " ".join(s for _, s in pieces if s and s != title)
+        context_text = " ".join(s for s in pieces if s and s != title)
 
     prompt = f"""You are an accurate assistant for employees.
 ONLY use the excerpts below to answer the question.
@@ -136,58 +406,462 @@ Excerpts:
 Answer format: {style_instr}
 """
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an accurate assistant for employees. ONLY use provided excerpts."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0
-        )
-        out = response.choices[0].message.content.strip()
-    except Exception as e:
-        out = f"⚠️ OpenAI API call failed: {e}"
-
-    if style == "bullet":
-        out = re.sub(r"(Step \d+:)", r"\n• \1", out)
-        out = re.sub(r"(•)", r"\n•", out)
-        lines = [line.strip() for line in out.split("\n") if line.strip()]
-        lines = [line for line in lines if title.lower() not in line.lower()]
-        section_header_pattern = re.compile(r"^\d+(\.\d+)*\s*[\.:]")
-        filtered = []
-        for x in lines:
-            if section_header_pattern.match(x):
-                break
-            if x.startswith("•") or x.startswith("-") or re.match(r"Step \d+:", x):
-                filtered.append(x)
-        for i, line in enumerate(filtered):
-            if not line.startswith(("•", "-")):
-                filtered[i] = "• " + line
-        seen, deduped = set(), []
-        for x in filtered:
-            norm = re.sub(r'\s+', ' ', x[:30].lower()).strip()
-            if norm not in seen and len(x) > 10:
-                deduped.append(x)
-                seen.add(norm)
-        out = "\n".join(deduped)
-    elif style == "sentence":
-        out_lines = [line for line in out.split("\n") if title.lower() not in line.lower()]
-        out = " ".join(out_lines).strip()
-
     source_ids = [{
         "section": (target_section.get("meta") or {}).get("title", "Unknown Section"),
+        "manual": (target_section.get("meta") or {}).get("manual"),
         "preview": target_section["text"][:200]
     }]
 
+    return {
+        "target_section": target_section,
+        "score": target_section["score"],
+        "distance": target_section.get("distance"),
+        "sentences": pieces,
+        "context": context_text,
+        "title": title,
+        "fallback": info["fallback"],
+        "prompt": prompt,
+        "sources": source_ids,
+    }
+
+def llm_messages(prompt):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+class AnswerStream:
+    """
+    Post-processing of the LLM output, applied line by line so it works on a
+    token stream as well as on a whole string.
+    feed(chunk) / close() return the finished lines (bullet and sentence styles)
+    or the raw chunks (any other style).
+    """
+
+    def __init__(self, style, title):
+        self.style = style
+        self.title = title.lower()
+        self.raw = ""
+        self.done_lines = 0
+        self.stopped = False
+        self.seen = set()
+
+    def feed(self, chunk):
+        self.raw += chunk
+        if self.style not in ("bullet", "sentence"):
+            return [chunk] if chunk else []
+        return self._drain(final=False)
+
+    def close(self):
+        if self.style not in ("bullet", "sentence"):
+            return []
+        return self._drain(final=True)
+
+    def join(self, lines):
+        if self.style == "bullet":
+            return "\n".join(lines)
+        if self.style == "sentence":
+            return " ".join(lines).strip()
+        return "".join(lines)
+
+    def _drain(self, final):
+        text = self.raw
+        if self.style == "bullet":
+            # "Step N:" and "•" always start a new line; a complete line
+            # (followed by a newline) can no longer change as tokens arrive
+            text = re.sub(r"(Step \d+:)", r"\n• \1", text)
+            text = re.sub(r"(•)", r"\n•", text)
+        lines = text.split("\n")
+        if not final:
+            lines = lines[:-1]
+        out = []
+        for line in lines[self.done_lines:]:
+            line = self._accept(line)
+            if line is not None:
+                out.append(line)
+        self.done_lines = len(lines)
+        return out
+
+    def _accept(self, line):
+        if self.style == "sentence":
+            return line if self.title not in line.lower() else None
+
+        x = line.strip()
+        if not x or self.stopped or self.title in x.lower():
+            return None
+        if SECTION_HEADER_PATTERN.match(x):
+            self.stopped = True
+            return None
+        if not (x.startswith("•") or x.startswith("-") or re.match(r"Step \d+:", x)):
+            return None
+        if not x.startswith(("•", "-")):
+            x = "• " + x
+        norm = re.sub(r'\s+', ' ', x[:30].lower()).strip()
+        if norm in self.seen or len(x) <= 10:
+            return None
+        self.seen.add(norm)
+        return x
+
+def postprocess_answer(out, style, title):
+    stream = AnswerStream(style, title)
+    lines = stream.feed(out) + stream.close()
+    return stream.join(lines) if style in ("bullet", "sentence") else out
+
+
+# ---------------- MAIN ANSWER ----------------
+def use_extractive(ctx, threshold=None):
+    # gated on the vector distance only: fused / BM25 scores are on other scales
+    threshold = EXTRACTIVE_THRESHOLD if threshold is None else threshold
+    return ctx.get("distance") is not None and ctx["distance"] < threshold
+
+def section_lines(ctx):
+    """The section's sentences as lines, without heading lines, up to the next section's heading"""
+    title = ctx["title"].lower()
+    for line in (line.strip() for s in ctx["sentences"] for line in s.split("\n")):
+        # the first sentence can still start with the "5.4 Refunds" heading line
+        if not line or section_title(line).lower() == title:
+            continue
+        if SECTION_HEADER_PATTERN.match(line):
+            return   # "6. Equipment Maintenance" glued to the end of 5.4
+        yield line
+
+def extractive_answer(ctx, style):
+    """
+    The answer without the LLM, from the section's sentences (the prompt excerpts).
+    Bullet style: one "• " line per bullet / step; a sub-heading label such as
+    "Daily:" prefixes the bullets under it so daily and weekly tasks stay apart.
+    """
+    with metrics.stage("extract"):
+        if style == "bullet":
+            bullets, label = [], ""
+            for line in section_lines(ctx):
+                if line.startswith(("•", "-")):
+                    text = line.lstrip("•- ").strip()
+                    if text:   # a lone "•" before "Step 1:" in the recipes
+                        bullets.append(f"• {label}{text}")
+                elif re.match(r"Step \d+:", line):
+                    bullets.append(f"• {label}{line}")
+                elif line.endswith(":"):
+                    label = line + " "
+                elif bullets:
+                    bullets[-1] += " " + line   # second sentence of the same bullet
+                else:
+                    bullets.append(f"• {line}")
+            out = "\n".join(dict.fromkeys(bullets))
+        else:
+            out = " ".join(section_lines(ctx))
+    return out.strip() or ctx["fallback"]
+
+def complete_answer(ctx, style):
+    """LLM call + post-processing for a prepared context: (answer, error or None)"""
+    error = None
+    try:
+        with metrics.stage("llm"):
+            response = client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=llm_messages(ctx["prompt"]),
+                max_tokens=400,
+                temperature=0
+            )
+        metrics.record_usage(getattr(response, "usage", None))
+        out = response.choices[0].message.content.strip()
+    except Exception as e:
+        error = f"OpenAI API call failed: {e}"
+        out = f"⚠️ {error}"
+
+    with metrics.stage("postprocess"):
+        out = postprocess_answer(out, style, ctx["title"])
     if not out.strip():
-        section_text = target_section["text"]
-        if section_text.startswith(title):
-            section_text = section_text[len(title):].strip()
-        out = section_text.strip()
+        out = ctx["fallback"]
+    return out.strip(), error
+
+def answer_question_detailed(query, style="bullet", top_k=TOP_K, use_cache=CACHE_ENABLED, mode=None, manual=None):
+    """
+    {"answer", "sources", "path"}; path says what produced the answer:
+    "llm", "extractive" (top hit's vector distance under EXTRACTIVE_THRESHOLD, no LLM call),
+    "extractive_fallback" (the LLM call failed), "cache" or "refusal".
+    """
+    init()
+    mode = mode or RETRIEVAL_MODE
+    trace = metrics.start_trace("arai.answer", query=query, style=style, mode=mode, manual=manual)
+    embedding = None
+    # lexical mode never embeds, so it cannot use the semantic cache either
+    use_cache = use_cache and mode != "lexical"
+    cache_key = (style, top_k, mode, manual)
+    if use_cache:
+        embedding = embed_query(query)
+        with trace.stage("cache_lookup"):
+            cached = answer_cache.lookup(embedding, cache_key)
+        if cached is not None:
+            trace.finish("cached")
+            return {"answer": cached[0], "sources": cached[1], "path": "cache"}
+
+    hits = retrieve(query, top_k=top_k, embedding=embedding, mode=mode, manual=manual)
+    with trace.stage("prepare"):
+        ctx = prepare_answer(query, hits, style=style)
+    if ctx is None:
+        trace.finish("refused")
+        return {"answer": REFUSAL, "sources": [], "path": "refusal"}
+
+    if use_extractive(ctx):
+        out, path = extractive_answer(ctx, style), "extractive"
+    else:
+        out, error = complete_answer(ctx, style)
+        path = "llm"
+        if error is not None:
+            # OpenAI down / failing: the extracted sentences are still a correct answer
+            out, path = extractive_answer(ctx, style), "extractive_fallback"
+            metrics.annotate(error=error)
+
+    if use_cache and path != "extractive_fallback":
+        answer_cache.store(embedding, cache_key, (out, ctx["sources"]))
+    trace.finish({"llm": "answered", "extractive": "extractive"}.get(path, "llm_error"), path=path)
+    return {"answer": out, "sources": ctx["sources"], "path": path}
+
+def answer_question(query, style="bullet", top_k=TOP_K, use_cache=CACHE_ENABLED, mode=None, manual=None):
+    res = answer_question_detailed(query, style=style, top_k=top_k, use_cache=use_cache, mode=mode, manual=manual)
+    return res["answer"], res["sources"]
+
+# ---------------- BATCH ----------------
+def answer_questions(queries, style="bullet", top_k=TOP_K, use_cache=CACHE_ENABLED, mode=None, manual=None,
+                     max_workers=BATCH_CONCURRENCY):
+    """
+    Many questions at once: one embedding request, one vector search, then at
+    most max_workers completions in parallel.
+    Returns one dict per question, in input order:
+      {"question", "answer", "sources", "path"} or {"question", "error"}
+    (path as in answer_question_detailed)
+    """
+    init()
+    mode = mode or RETRIEVAL_MODE
+    trace = metrics.start_trace("arai.answer_batch", questions=len(queries), style=style, mode=mode, manual=manual)
+    use_cache = use_cache and mode != "lexical"
+    cache_key = (style, top_k, mode, manual)
+    results = [{"question": q} for q in queries]
+    # per-question stages / retrieval fields, one sampled log line each (the batch trace keeps the totals)
+    items = [metrics.Trace("arai.answer_batch.item", index=i, query=q) for i, q in enumerate(queries)]
+    outcomes = {}
+
+    def fail(i, outcome, error):
+        results[i]["error"] = error
+        outcomes[i] = outcome
+        items[i].fields["error"] = error
+
+    todo = []
+    for i, q in enumerate(queries):
+        if isinstance(q, str) and q.strip():
+            todo.append(i)
+        else:
+            fail(i, "invalid", "Empty question")
+
+    embeddings = {}
+    if todo and mode != "lexical":
+        try:
+            for i, emb in zip(todo, embed_queries([queries[i] for i in todo])):
+                embeddings[i] = emb
+        except Exception as e:
+            for i in todo:
+                fail(i, "error", f"Embedding failed: {e}")
+            todo = []
+
+    if use_cache:
+        pending = []
+        for i in todo:
+            cached = answer_cache.lookup(embeddings[i], cache_key)
+            if cached is None:
+                pending.append(i)
+                continue
+            results[i].update(answer=cached[0], sources=cached[1], path="cache")
+            outcomes[i] = "cached"
+        todo = pending
+
+    contexts = {}
+    if todo:
+        try:
+            hits = retrieve_many(
+                [queries[i] for i in todo], top_k=top_k, mode=mode, manual=manual,
+                embeddings=[embeddings[i] for i in todo] if embeddings else None,
+            )
+        except Exception as e:
+            for i in todo:
+                fail(i, "error", f"Retrieval failed: {e}")
+            hits = []
+        for i, h in zip(todo, hits):
+            with trace.stage("prepare"), metrics.use_trace(items[i]):
+                ctx = prepare_answer(queries[i], h, style=style)
+            if ctx is None:
+                results[i].update(answer=REFUSAL, sources=[], path="refusal")
+                outcomes[i] = "refused"
+            elif use_extractive(ctx):
+                with metrics.use_trace(items[i]):
+                    out = extractive_answer(ctx, style)
+                results[i].update(answer=out, sources=ctx["sources"], path="extractive")
+                outcomes[i] = "extractive"
+                if use_cache:
+                    answer_cache.store(embeddings[i], cache_key, (out, ctx["sources"]))
+            else:
+                contexts[i] = ctx
+
+    def complete(i):
+        with metrics.use_trace(items[i]):
+            out, error = complete_answer(contexts[i], style)
+            if error:
+                out = extractive_answer(contexts[i], style)
+                metrics.annotate(error=error)
+        if error:
+            results[i].update(answer=out, sources=contexts[i]["sources"], path="extractive_fallback")
+            outcomes[i] = "llm_error"
+            return
+        results[i].update(answer=out, sources=contexts[i]["sources"], path="llm")
+        outcomes[i] = "answered"
+        if use_cache:
+            answer_cache.store(embeddings[i], cache_key, (out, contexts[i]["sources"]))
+
+    if contexts:
+        with trace.stage("completions"), ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(contexts)))) as pool:
+            list(pool.map(complete, contexts))
+
+    # outcomes are counted per question, by the item traces
+    for i, item in enumerate(items):
+        item.finish(outcomes[i], path=results[i].get("path"))
+    trace.finish("batch", count=False, errors=sum("error" in r for r in results))
+    return results
+
+# ---------------- ASYNC / STREAMING ----------------
+async def aembed_query(query):
+    init()
+    with metrics.stage("embedding"):
+        res = await aclient.embeddings.create(model=EMBEDDING_MODEL, input=[query])
+    return res.data[0].embedding
+
+async def aretrieve(query, top_k=TOP_K, embedding=None, mode=None, manual=None):
+    mode = mode or RETRIEVAL_MODE
+    if embedding is None and mode != "lexical":
+        embedding = await aembed_query(query)
+    # Chroma's client is sync-only; keep its query off the event loop
+    return await asyncio.to_thread(retrieve, query, top_k, embedding, mode, manual)
+
+async def astream_answer(query, style="bullet", top_k=TOP_K, use_cache=CACHE_ENABLED, mode=None, manual=None):
+    """
+    Async generator of answer events:
+      {"type": "line", "text": ...}   a finished bullet / sentence line
+      {"type": "chunk", "text": ...}  raw tokens (other styles)
+      {"type": "done", "answer": ..., "sources": [...], "path": ...}
+    (path as in answer_question_detailed, plus "llm_error": the stream broke
+    after some lines were sent, so the answer ends with the error line)
+    """
+    init()
+    mode = mode or RETRIEVAL_MODE
+    trace = metrics.start_trace("arai.stream_answer", query=query, style=style, mode=mode, manual=manual)
+    try:
+        embedding = None
+        use_cache = use_cache and mode != "lexical"
+        cache_key = (style, top_k, mode, manual)
+        if use_cache:
+            embedding = await aembed_query(query)
+            with trace.stage("cache_lookup"):
+                cached = answer_cache.lookup(embedding, cache_key)
+            if cached is not None:
+                trace.finish("cached")
+                answer, sources = cached
+                for line in (answer.split("\n") if style == "bullet" else [answer]):
+                    yield {"type": "line", "text": line}
+                yield {"type": "done", "answer": answer, "sources": sources, "path": "cache"}
+                return
+
+        hits = await aretrieve(query, top_k=top_k, embedding=embedding, mode=mode, manual=manual)
+        with trace.stage("prepare"):
+            ctx = prepare_answer(query, hits, style=style)
+        if ctx is None:
+            trace.finish("refused")
+            yield {"type": "line", "text": REFUSAL}
+            yield {"type": "done", "answer": REFUSAL, "sources": [], "path": "refusal"}
+            return
+
+        if use_extractive(ctx):
+            out = extractive_answer(ctx, style)
+            for line in (out.split("\n") if style == "bullet" else [out]):
+                yield {"type": "line", "text": line}
+            if use_cache:
+                answer_cache.store(embedding, cache_key, (out, ctx["sources"]))
+            trace.finish("extractive", path="extractive")
+            yield {"type": "done", "answer": out, "sources": ctx["sources"], "path": "extractive"}
+            return
+
+        event_type = "line" if style in ("bullet", "sentence") else "chunk"
+        stream = AnswerStream(style, ctx["title"])
+        emitted = []
+        llm_error = None
+        # "llm" covers the whole stream, including the time the client takes to read it
+        llm_start = time.perf_counter()
+        try:
+            response = await aclient.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=llm_messages(ctx["prompt"]),
+                max_tokens=400,
+                temperature=0,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            async for chunk in response:
+                if getattr(chunk, "usage", None):
+                    metrics.record_usage(chunk.usage)   # last chunk, no choices
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                for text in stream.feed(delta):
+                    emitted.append(text)
+                    yield {"type": event_type, "text": text}
+        except Exception as e:
+            # nothing sent yet: answer from the extracted sentences instead (below)
+            llm_error = f"⚠️ OpenAI API call failed: {e}"
+
+        llm_seconds = time.perf_counter() - llm_start
+        trace.stages["llm"] = llm_seconds
+        metrics.STAGE_SECONDS.labels(stage="llm").observe(llm_seconds)
+
+        if llm_error and not emitted:
+            out = extractive_answer(ctx, style)
+            for line in (out.split("\n") if style == "bullet" else [out]):
+                yield {"type": "line", "text": line}
+            trace.finish("llm_error", path="extractive_fallback")
+            yield {"type": "done", "answer": out, "sources": ctx["sources"], "path": "extractive_fallback"}
+            return
+
+        for text in stream.close():
+            emitted.append(text)
+            yield {"type": event_type, "text": text}
+        if llm_error:
+            # broke mid-answer: end with the error on its own line instead of a silently cut answer
+            text = llm_error if event_type == "line" else "\n" + llm_error
+            emitted.append(text)
+            yield {"type": event_type, "text": text}
+
+        out = stream.join(emitted).strip()
+        if not out:
+            out = ctx["fallback"]
+            yield {"type": "line", "text": out}
+
+        if use_cache and not llm_error:
+            answer_cache.store(embedding, cache_key, (out, ctx["sources"]))
+        path = "llm_error" if llm_error else "llm"
+        trace.finish("llm_error" if llm_error else "answered", path=path)
+        yield {"type": "done", "answer": out, "sources": ctx["sources"], "path": path}
+    except (GeneratorExit, asyncio.CancelledError):
+        # the client went away mid-answer
+        if not trace.finished:
+            trace.finish("aborted")
+        raise
+    except Exception as e:
+        if not trace.finished:
+            trace.finish("error", error=str(e))
+        raise
 
-    return out.strip(), source_ids
+async def aanswer_question(query, style="bullet", top_k=TOP_K, use_cache=CACHE_ENABLED, mode=None, manual=None):
+    """Async counterpart of answer_question (same return shape)"""
+    async for event in astream_answer(query, style=style, top_k=top_k, use_cache=use_cache, mode=mode, manual=manual):
+        if event["type"] == "done":
+            return event["answer"], event["sources"]
 
 # ---------------- INTERACTIVE ----------------
 if __name__ == "__main__":
@@ -0,0 +1,448 @@
+# benchmark.py
+"""
+Reproducible benchmarks for the core functions and their API endpoints.
+
+Everything runs offline on synthetic data: availability matrices, idea/kudos
+histories and performance rosters are generated from a fixed seed into a
+scratch directory per scale, and Arai uses local stand-ins (hashed
+bag-of-words embeddings, an extractive fake chat completion, the numpy
+vector index instead of Chroma).
+
+    python benchmark.py [run] [small,medium,large]   -> bench_results/bench-<time>.json
+    python benchmark.py compare old.json new.json     -> p50 ratios, exit 1 on regressions
+"""
+import contextlib
+import csv
+import hashlib
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", os.path.join(BASE_DIR, "bench_results"))
+SEED = int(os.getenv("BENCH_SEED", "42"))
+REPEATS = int(os.getenv("BENCH_REPEATS", "50"))        # timed calls per benchmark
+WARMUP = int(os.getenv("BENCH_WARMUP", "3"))           # untimed calls first
+LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", "0"))   # simulated OpenAI round trip
+EMBED_DIM = 256
+REGRESSION_RATIO = float(os.getenv("BENCH_REGRESSION_RATIO", "1.2"))   # compare: new p50 / old p50
+SCALES = {
+    "small": {"employees": 20, "shifts": 14, "ideas": 200, "kudos": 200, "roster": 100, "sections": 50},
+    "medium": {"employees": 200, "shifts": 28, "ideas": 2000, "kudos": 2000, "roster": 2000, "sections": 400},
+    "large": {"employees": 1000, "shifts": 42, "ideas": 20000, "kudos": 20000, "roster": 20000, "sections": 2000},
+}
+DEFAULT_SCALES = os.getenv("BENCH_SCALES", "small,medium")
+# config files copied as-is into the scratch directory
+CONFIG_FILES = ["career_path.json", "nudge_library.json", "challenges.json"]
+# ----------------------------------------
+
+WORDS = (
+    "espresso latte milk grinder refund receipt customer complaint manager shift opening closing "
+    "cleaning sanitizer counter register cash float delivery inventory storage fridge temperature "
+    "allergen label waste safety emergency exit first aid uniform hygiene toast avocado sandwich "
+    "order queue drive payment card voucher loyalty points training schedule roster break "
+    "machine descale filter steam wand jug cup lid straw napkin tray floor mop bucket"
+).split()
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+# ---------------- SYNTHETIC DATA ----------------
+def shift_names(n):
+    """Mon_AM, Mon_PM, ... then Mon_AM2, ... for more than 14 shifts"""
+    names = []
+    for k in range(n):
+        day, slot = DAYS[(k // 2) % 7], "AM" if k % 2 == 0 else "PM"
+        rnd = k // 14
+        names.append(f"{day}_{slot}{rnd + 1 if rnd else ''}")
+    return names
+
+
+def make_availability(employees, shifts, density=0.5, seed=SEED):
+    """Employee, MaxHoursPerWeek, one 0/1 column per shift (like schedule.csv)"""
+    rng = np.random.default_rng(seed)
+    avail = (rng.random((employees, shifts)) < density).astype(int)
+    df = pd.DataFrame(avail, columns=shift_names(shifts))
+    df.insert(0, "MaxHoursPerWeek", rng.integers(2, max(3, shifts // 2), size=employees))
+    df.insert(0, "Employee", [f"Emp{i:05d}" for i in range(employees)])
+    return df
+
+
+def sentence(rng, n_words=10):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def write_ideas(path, n, seed=SEED):
+    rng = random.Random(seed)
+    start = 1706150000
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["idea_id", "idea_text", "submitted_by", "branch_id", "upvotes", "timestamp"])
+        for i in range(1, n + 1):
+            w.writerow([i, sentence(rng, 8), f"Emp{rng.randrange(500):05d}", f"Branch{rng.randrange(30)}",
+                        rng.randrange(50), float(start + i * 60)])
+
+
+def write_kudos(path, n, seed=SEED):
+    rng = random.Random(seed + 1)
+    start = 1706152000
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["kudos_id", "from_employee", "to_employee", "message", "timestamp"])
+        for i in range(1, n + 1):
+            w.writerow([i, f"Emp{rng.randrange(500):05d}", f"Emp{rng.randrange(500):05d}",
+                        sentence(rng, 9), start + i * 60])
+
+
+def write_roster(path, n, career, seed=SEED):
+    """mock_performance.csv with roles from career_path.json and random unlocked skills"""
+    rng = random.Random(seed + 2)
+    roles = list(career)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["employee_id", "name", "role", "order_accuracy_percent", "avg_speed_seconds",
+                    "customer_feedback_score", "skills_unlocked"])
+        for i in range(n):
+            role = rng.choice(roles)
+            required = career[role]["skills_required"]
+            skills = rng.sample(required, rng.randrange(len(required) + 1))
+            w.writerow([100 + i, f"Name{i}", role, rng.randrange(85, 100), rng.randrange(30, 60),
+                        round(rng.uniform(3.5, 5.0), 1), ";".join(skills)])
+
+
+def make_manual(sections, seed=SEED):
+    """Numbered sections ("3 Milk Steaming\\n<sentences>") like the ones split out of the PDF"""
+    rng = random.Random(seed + 3)
+    out = []
+    for k in range(1, sections + 1):
+        title = " ".join(w.capitalize() for w in rng.sample(WORDS, 3))
+        body = " ".join(sentence(rng, rng.randrange(6, 14)) for _ in range(rng.randrange(3, 12)))
+        out.append(f"{k} {title}\n{body}")
+    return out
+
+
+def make_questions(manual, n, seed=SEED):
+    """Mostly on-topic questions (words from a section), some off-topic ones (refusals)"""
+    rng = random.Random(seed + 4)
+    questions = []
+    for i in range(n):
+        if i % 5 == 4:
+            questions.append(f"What is the capital of country number {i}?")
+            continue
+        words = re.findall(r"[a-z]+", rng.choice(manual).lower())
+        questions.append("How do I " + " ".join(rng.sample(words, min(5, len(words)))) + "?")
+    return questions
+
+
+# ---------------- OFFLINE STAND-INS ----------------
+class HashEmbedding:
+    """Deterministic stand-in for OpenAIEmbeddingFunction: hashed bag of words, unit length"""
+
+    def __init__(self, dim=EMBED_DIM):
+        self.dim = dim
+
+    def __call__(self, input):
+        out = []
+        for text in input:
+            v = np.zeros(self.dim, dtype=np.float32)
+            for w in re.findall(r"\w+", text.lower()):
+                v[int(hashlib.md5(w.encode()).hexdigest()[:8], 16) % self.dim] += 1
+            n = np.linalg.norm(v)
+            out.append(v / n if n else v)
+        return out
+
+
+class StubCompletions:
+    """Stand-in for client.chat.completions: answers with the prompt's excerpts"""
+
+    def __init__(self, latency_ms=LLM_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+
+    def create(self, model, messages, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        excerpts = prompt.split("Excerpts:\n", 1)[-1].split("\n\nAnswer format", 1)[0]
+        prompt_tokens = len(re.findall(r"\w+", " ".join(m["content"] for m in messages)))
+        completion_tokens = len(re.findall(r"\w+", excerpts))
+        return types.SimpleNamespace(
+            choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=excerpts))],
+            usage=types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                        total_tokens=prompt_tokens + completion_tokens),
+        )
+
+
+class StubClient:
+    def __init__(self, latency_ms=LLM_LATENCY_MS):
+        self.chat = types.SimpleNamespace(completions=StubCompletions(latency_ms))
+
+
+def install_arai_standins(manual):
+    """
+    Point arai_rag at in-memory indexes over the synthetic manual, with the
+    stand-ins above, and mark it initialised so init() never touches OpenAI/Chroma.
+    """
+    import arai_rag
+    from lexical_index import BM25Index
+    from manual_text import chunk_section, prepare_section, section_title
+    from vector_index import VectorIndex
+
+    ids, docs, metas, prepared = [], [], [], {}
+    for k, sec in enumerate(manual):
+        title = section_title(sec)
+        parent = f"bench/sec-{k}"
+        pieces = chunk_section(sec)
+        for n, piece in enumerate(pieces):
+            chunk_id = f"{parent}#{n}"
+            ids.append(chunk_id)
+            docs.append(piece)
+            metas.append({"title": title, "manual": "bench", "section_id": parent,
+                          "chunk_index": n, "chunk_count": len(pieces)})
+            prepared[chunk_id] = prepare_section(piece, title)
+
+    embed = HashEmbedding()
+    arai_rag.embedding_func = embed
+    arai_rag.client = StubClient()
+    arai_rag.vector_index = VectorIndex.build(ids, embed(docs), docs, metas)
+    arai_rag.collection = None
+    arai_rag.lexical_index = BM25Index.build(ids, docs, metas)
+    arai_rag.prepared_sections = prepared
+    arai_rag._ready = True
+    arai_rag.answer_cache.clear()
+    return arai_rag
+
+
+def reset_agents():
+    """Drop the cached Kai / Jai stores so they re-open the files in the current directory"""
+    import jai_agent
+    import kai_agent
+    import kai_store
+
+    kai_store.close()
+    kai_store._store = None
+    kai_store._summary = None
+    kai_agent._challenge_cache.update(mtime=None, data=None)
+    jai_agent.store = jai_agent.JaiStore()
+
+
+@contextlib.contextmanager
+def workspace(scale, params):
+    """Scratch directory with the synthetic files for one scale; cwd while active"""
+    tmp = tempfile.mkdtemp(prefix=f"bench-{scale}-")
+    cwd = os.getcwd()
+    try:
+        for name in CONFIG_FILES:
+            shutil.copy(os.path.join(BASE_DIR, name), tmp)
+        with open(os.path.join(tmp, "career_path.json"), encoding="utf-8") as f:
+            career = json.load(f)
+        write_ideas(os.path.join(tmp, "ideas.csv"), params["ideas"])
+        write_kudos(os.path.join(tmp, "kudos.csv"), params["kudos"])
+        write_roster(os.path.join(tmp, "mock_performance.csv"), params["roster"], career)
+        os.chdir(tmp)
+        reset_agents()
+        yield tmp
+    finally:
+        reset_agents()
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# ---------------- MEASUREMENT ----------------
+def measure(name, kind, scale, fn, repeats=REPEATS, warmup=WARMUP):
+    """
+    fn(i) is called warmup + repeats times; only the last repeats are timed.
+    Peak memory comes from one extra call under tracemalloc (kept out of the
+    timings, tracing slows allocation-heavy code down).
+    """
+    for i in range(warmup):
+        fn(i)
+    timings = []
+    for i in range(warmup, warmup + repeats):
+        start = time.perf_counter()
+        fn(i)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn(warmup + repeats)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    ms = np.array(timings) * 1000
+    return {
+        "name": name,
+        "kind": kind,
+        "scale": scale,
+        "calls": repeats,
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "min_ms": round(float(ms.min()), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "throughput_per_s": round(repeats / (ms.sum() / 1000), 2) if ms.sum() else None,
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+# ---------------- BENCHMARKS ----------------
+def run_scale(scale, params, repeats=REPEATS, warmup=WARMUP):
+    import jai_agent
+    import kai_agent
+    import scheduler
+
+    results = []
+    with workspace(scale, params), open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        availability = make_availability(params["employees"], params["shifts"])
+        manual = make_manual(params["sections"])
+        questions = make_questions(manual, warmup + repeats + 1)
+        arai_rag = install_arai_standins(manual)
+        kai_agent.manager_summary()   # first open imports the CSVs into the scratch kai.db
+
+        rng = random.Random(SEED)
+        schedule = scheduler.solve_schedule(availability, seed=SEED)
+        employees, shifts = schedule.index.tolist(), schedule.columns.tolist()
+        swaps = [(rng.choice(employees), rng.choice(employees), rng.choice(shifts))
+                 for _ in range(warmup + repeats + 1)]
+        jai_agent.store.refresh()
+        emp_ids = list(jai_agent.store.employees)
+        nudge_ids = [int(rng.choice(emp_ids)) for _ in range(warmup + repeats + 1)]
+
+        functions = {
+            "solve_schedule[greedy]": lambda i: scheduler.solve_schedule(availability, seed=i),
+            "solve_schedule[optimal]": lambda i: scheduler.solve_schedule(availability, seed=i, mode="optimal"),
+            "swap_shift": lambda i: scheduler.swap_shift(schedule, *swaps[i], availability),
+            "answer_question": lambda i: arai_rag.answer_question(questions[i], use_cache=False),
+            "manager_summary": lambda i: kai_agent.manager_summary(),
+            "get_weekly_nudge": lambda i: jai_agent.get_weekly_nudge(nudge_ids[i]),
+        }
+        for name, fn in functions.items():
+            results.append(measure(name, "function", scale, fn, repeats, warmup))
+
+        from fastapi.testclient import TestClient
+        import api
+
+        client = TestClient(api.app)   # not entered: no warm-up thread, no shutdown hooks
+        avail_json = availability.to_dict()
+        sched_json = schedule.to_dict()
+
+        def call(method, url, **kwargs):
+            res = client.request(method, url, **kwargs)
+            if res.status_code != 200:
+                raise RuntimeError(f"{method} {url} -> {res.status_code}: {res.text[:200]}")
+            return res
+
+        endpoints = {
+            "POST /generate_schedule": lambda i: call("POST", "/generate_schedule",
+                                                      json={"availability": avail_json, "seed": i}),
+            "POST /swap_shift": lambda i: call("POST", "/swap_shift", json={
+                "schedule": sched_json, "emp1": swaps[i][0], "emp2": swaps[i][1], "shift": swaps[i][2],
+                "availability": avail_json}),
+            "POST /ask_arai": lambda i: call("POST", "/ask_arai", json={"question": questions[i]}),
+            "GET /kai/summary": lambda i: call("GET", "/kai/summary"),
+            "GET /jai/nudge/{id}": lambda i: call("GET", f"/jai/nudge/{nudge_ids[i]}"),
+        }
+        arai_rag.answer_cache.clear()
+        for name, fn in endpoints.items():
+            results.append(measure(name, "endpoint", scale, fn, repeats, warmup))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(scales=None, repeats=REPEATS, warmup=WARMUP, out=None):
+    """Run every benchmark at the given scales and save the JSON report; returns it"""
+    scales = scales or [s.strip() for s in DEFAULT_SCALES.split(",") if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        raise ValueError(f"Unknown scale(s): {', '.join(unknown)} (use {', '.join(SCALES)})")
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "seed": SEED,
+            "repeats": repeats,
+            "warmup": warmup,
+            "llm_latency_ms": LLM_LATENCY_MS,
+            "scales": {s: SCALES[s] for s in scales},
+        },
+        "results": [],
+    }
+    for scale in scales:
+        report["results"].extend(run_scale(scale, SCALES[scale], repeats, warmup))
+
+    out = out or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    report["path"] = out
+    return report
+
+
+def compare(old, new, ratio=REGRESSION_RATIO):
+    """[(scale, name, old p50, new p50, new / old, regressed)] for benchmarks in both reports"""
+    before = {(r["scale"], r["name"]): r for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        o = before.get((r["scale"], r["name"]))
+        if o is None:
+            continue
+        change = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else None
+        rows.append((r["scale"], r["name"], o["p50_ms"], r["p50_ms"], change,
+                     change is not None and change > ratio))
+    return rows
+
+
+def print_results(results):
+    print(f"{'scale':<8}{'benchmark':<28}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak KB':>10}")
+    for r in results:
+        print(f"{r['scale']:<8}{r['name']:<28}{r['p50_ms']:>10.3f}{r['p90_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['throughput_per_s'] or 0:>10.1f}{r['peak_mem_kb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, BASE_DIR)   # modules are imported after chdir into the scratch directory
+    args = sys.argv[1:]
+    cmd = args.pop(0) if args and args[0] in ("run", "compare") else "run"
+    if cmd == "compare":
+        if len(args) != 2:
+            sys.exit("usage: python benchmark.py compare old.json new.json")
+        reports = []
+        for path in args:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        rows = compare(*reports)
+        for scale, name, before, after, change, regressed in rows:
+            mark = "❌" if regressed else "✅"
+            print(f"{mark} {scale:<8}{name:<28}{before:>10.3f} -> {after:>10.3f} ms"
+                  f"{'' if change is None else f'  x{change:.2f}'}")
+        sys.exit(1 if any(r[-1] for r in rows) else 0)
+    report = run(args[0].split(",") if args else None)
+    print_results(report["results"])
+    print(f"✅ Results saved to {report['path']}")
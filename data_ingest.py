@@ -1,44 +1,228 @@
 # data_ingest.py
 import os
 import re
+import sys
+import json
+import time
+import hashlib
 import pdfplumber
+from pdfminer.pdftypes import resolve1
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import chromadb
 from chromadb.utils import embedding_functions
+from lexical_index import BM25Index
+from vector_index import VectorIndex
+from manual_text import section_title, prepare_section, chunk_section
 
 # ----------- CONFIG -----------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PDF_PATH = os.path.join(BASE_DIR, "FAN_Manual.pdf")
+MANUALS_DIR = os.getenv("MANUALS_DIR", BASE_DIR)   # every *.pdf in here is ingested
 CHROMA_DB_DIR = os.path.join(BASE_DIR, "chroma_db")
 COLLECTION_NAME = "fan_manual"
+# touched after every rebuild so running API processes drop their answer cache
+INGEST_STAMP_FILE = os.path.join(CHROMA_DB_DIR, f"{COLLECTION_NAME}.stamp")
+BM25_INDEX_FILE = os.path.join(CHROMA_DB_DIR, f"{COLLECTION_NAME}_bm25.json")
+# pre-split sentences + fallback text per chunk id, loaded by arai_rag at startup
+SECTIONS_FILE = os.path.join(CHROMA_DB_DIR, f"{COLLECTION_NAME}_sections.json")
+# embeddings exported for the in-memory numpy retriever (<prefix>.npy + <prefix>.json)
+VECTOR_INDEX_PREFIX = os.path.join(CHROMA_DB_DIR, f"{COLLECTION_NAME}_vectors")
+EMBED_BATCH_SIZE = 100   # chunks per embedding request
+CHUNK_TOKENS = 256       # max (approximate) tokens per chunk
+CHUNK_OVERLAP = 40       # tokens of trailing sentences repeated at the start of the next chunk
+# per-page extracted text, keyed by a hash of the page, so unchanged pages are never re-extracted
+PAGE_CACHE_DIR = os.path.join(CHROMA_DB_DIR, "page_cache")
+PAGE_CACHE_VERSION = "1"   # bump when extraction settings change
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = 4
+HEADING_SPLIT = r"\n(?=\d+(?:\.\d+)*\s+)"
 
 # ------------------------------
 
-def load_manual(path):
-    """อ่าน PDF ทั้งหมดด้วย pdfplumber"""
+# ---------------- PDF EXTRACTION ----------------
+def _hash_pdf_object(h, obj, depth=0):
+    """Feed a PDF object into h with references resolved (dicts, arrays, stream data)"""
+    obj = resolve1(obj)
+    if depth > 8:   # Type3 fonts can nest resources; deep enough for anything that maps glyphs to text
+        return
+    if hasattr(obj, "get_data"):
+        _hash_pdf_object(h, obj.attrs, depth + 1)
+        h.update(obj.get_data())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            if key == "FontDescriptor":
+                continue   # embedded glyph programs: large, and they do not change the extracted text
+            h.update(str(key).encode())
+            _hash_pdf_object(h, obj[key], depth + 1)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            _hash_pdf_object(h, value, depth + 1)
+    else:
+        h.update(repr(obj).encode())
+
+def _page_fingerprint(page):
+    """
+    Hash of what determines a page's text: content streams, page box and the
+    fonts themselves (BaseFont, encoding, widths, ToUnicode maps), not just their
+    resource names, which every PDF generator reuses (/F1, /F2, ...).
+    """
+    h = hashlib.sha256(PAGE_CACHE_VERSION.encode())
+    obj = page.page_obj
+    for stream in obj.contents or []:
+        stream = resolve1(stream)
+        if hasattr(stream, "get_data"):
+            h.update(stream.get_data())
+    h.update(repr(obj.mediabox).encode())
+    _hash_pdf_object(h, (obj.resources or {}).get("Font"))
+    return h.hexdigest()
+
+def _extract_pages(path, page_numbers):
+    # runs in a worker process: open the PDF once per batch of pages
+    out = []
+    with pdfplumber.open(path) as pdf:
+        for i in page_numbers:
+            out.append((i, pdf.pages[i].extract_text() or ""))
+    return out
+
+def _cache_path(page_hash):
+    return os.path.join(PAGE_CACHE_DIR, f"{page_hash}.txt")
+
+def iter_pages(path, workers=EXTRACT_WORKERS):
+    """
+    Yield each page's text in order.
+    Pages already extracted (same fingerprint) come from the page cache; the
+    rest are extracted in parallel on a process pool, PAGES_PER_TASK at a time.
+    """
     if not os.path.exists(path):
         raise FileNotFoundError(f"ไม่เจอไฟล์: {path}")
+    os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
 
-    text = ""
     with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+        hashes = [_page_fingerprint(page) for page in pdf.pages]
+
+    done = {}   # page index -> text, waiting for its turn to be yielded
+    missing = []
+    for i, page_hash in enumerate(hashes):
+        if os.path.exists(_cache_path(page_hash)):
+            with open(_cache_path(page_hash), "r", encoding="utf-8") as f:
+                done[i] = f.read()
+        else:
+            missing.append(i)
+
+    def store(i, text):
+        tmp = _cache_path(hashes[i]) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, _cache_path(hashes[i]))
+        done[i] = text
+
+    nxt = 0
+    if missing:
+        batches = [missing[b:b + PAGES_PER_TASK] for b in range(0, len(missing), PAGES_PER_TASK)]
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(batches)))) as pool:
+            futures = [pool.submit(_extract_pages, path, batch) for batch in batches]
+            for fut in as_completed(futures):
+                for i, text in fut.result():
+                    store(i, text)
+                while nxt in done:
+                    yield done.pop(nxt)
+                    nxt += 1
+    while nxt in done:
+        yield done.pop(nxt)
+        nxt += 1
+
+def load_manual(path):
+    """อ่าน PDF ทั้งหมดด้วย pdfplumber"""
+    return "".join(page_text + "\n" for page_text in iter_pages(path) if page_text)
 
 def split_sections(text):
     """
     split ตาม heading ทั้งหลัก (1., 2.) และย่อย (1.1, 5.4, ...)
     ใช้ regex กันไม่ให้แตก .1, .2 ออกมาเป็น section เดี่ยว
     """
-    parts = re.split(r"\n(?=\d+(?:\.\d+)*\s+)", text)
+    parts = re.split(HEADING_SPLIT, text)
     sections = [p.strip() for p in parts if p.strip()]
     return sections
 
-def ingest_to_chroma(sections):
+def iter_sections(pages):
+    """
+    Streaming split_sections over page texts: a section is emitted as soon as
+    the next heading is seen. Gives the same sections as
+    split_sections(load_manual(...)).
+    """
+    buf = ""
+    for page_text in pages:
+        if not page_text:
+            continue
+        buf += page_text + "\n"
+        # only the trailing newline can still turn into a boundary, so every
+        # boundary found before the end of the buffer is final
+        parts = re.split(HEADING_SPLIT, buf)
+        for part in parts[:-1]:
+            if part.strip():
+                yield part.strip()
+        buf = parts[-1]
+    if buf.strip():
+        yield buf.strip()
+
+def section_id(title, used):
+    """Stable id from the heading text (no running index, no section number)"""
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-") or "section"
+    sec_id, n = f"sec-{slug}", 2
+    while sec_id in used:
+        sec_id, n = f"sec-{slug}-{n}", n + 1
+    used.add(sec_id)
+    return sec_id
+
+def content_hash(text):
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def manual_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def manual_paths(directory=MANUALS_DIR):
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.lower().endswith(".pdf")
+    )
+
+def build_chunks(manuals):
+    """
+    manuals: {manual name: [section texts]}
+    Returns [(chunk id, chunk text, metadata)]; ids look like
+    "<manual>/sec-<heading slug>#<chunk index>" so they stay stable across edits.
+    """
+    chunks = []
+    for manual, sections in manuals.items():
+        used = set()
+        for sec in sections:
+            # ดึงบรรทัดแรกมาเป็น title (ตัดเลข heading ออก)
+            title = section_title(sec)
+            parent = f"{manual}/{section_id(title, used)}"
+            pieces = chunk_section(sec, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP)
+            for k, piece in enumerate(pieces):
+                chunks.append((f"{parent}#{k}", piece, {
+                    "title": title,
+                    "manual": manual,
+                    "section_id": parent,
+                    "chunk_index": k,
+                    "chunk_count": len(pieces),
+                    "hash": content_hash(piece),
+                }))
+    return chunks
+
+def ingest_to_chroma(manuals):
     """
-    สร้าง/เชื่อมต่อ Chroma DB แล้ว persist sections ลงไป
+    สร้าง/เชื่อมต่อ Chroma DB แล้ว sync chunks แบบ incremental:
+    chunk ที่ hash ไม่เปลี่ยนจะถูกข้าม, ที่หายไปจะถูกลบ,
+    ที่ใหม่/แก้ไขจะถูก embed เป็น batch
+    manuals: {manual name: [section texts]} (a plain list = sections of FAN_Manual)
+    Only the manuals passed in are synced: other manuals' chunks stay as they are.
     """
+    if not isinstance(manuals, dict):
+        manuals = {manual_name(PDF_PATH): list(manuals)}
+
     client = chromadb.PersistentClient(path=CHROMA_DB_DIR)
 
     # ใช้ OpenAI embedding
@@ -47,33 +231,103 @@ def ingest_to_chroma(sections):
         model_name="text-embedding-3-small"
     )
 
-    # ลบ collection เก่าแล้วสร้างใหม่ (กันข้อมูลซ้ำ)
-    if COLLECTION_NAME in [c.name for c in client.list_collections()]:
-        client.delete_collection(COLLECTION_NAME)
-    collection = client.create_collection(
+    collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
         embedding_function=embedding_func
     )
 
-    # add batch
-    for i, sec in enumerate(sections):
-        # ดึงบรรทัดแรกมาเป็น title (ตัดเลข heading ออก)
-        first_line = sec.split("\n", 1)[0]
-        title = re.sub(r"^\d+(?:\.\d+)*\s+", "", first_line).strip()
+    existing = collection.get(include=["metadatas"])
+    # chunks of the manuals in this run (ingested before "manual" metadata existed = FAN_Manual)
+    existing_hash = {
+        doc_id: (meta or {}).get("hash")
+        for doc_id, meta in zip(existing["ids"], existing["metadatas"])
+        if (meta or {}).get("manual", manual_name(PDF_PATH)) in manuals
+    }
+
+    chunks = build_chunks(manuals)
+    prepared = {}
+    pending = []   # (id, document, metadata) to embed
+    report = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0, "embed_seconds": 0.0}
+    for chunk_id, text, meta in chunks:
+        prepared[chunk_id] = prepare_section(text, meta["title"])
+        if existing_hash.get(chunk_id) == meta["hash"]:
+            report["skipped"] += 1
+            continue
+        report["updated" if chunk_id in existing_hash else "added"] += 1
+        pending.append((chunk_id, text, meta))
 
-        collection.add(
-            documents=[sec],
-            metadatas=[{"title": title}],
-            ids=[f"sec-{i}"]
+    keep = {chunk_id for chunk_id, _, _ in chunks}
+    removed = [doc_id for doc_id in existing_hash if doc_id not in keep]
+    if removed:
+        collection.delete(ids=removed)
+        report["deleted"] = len(removed)
+
+    # embed new / changed chunks in large batches (one request per batch)
+    for b in range(0, len(pending), EMBED_BATCH_SIZE):
+        batch = pending[b:b + EMBED_BATCH_SIZE]
+        docs = [doc for _, doc, _ in batch]
+        start = time.perf_counter()
+        embeddings = embedding_func(docs)
+        report["embed_seconds"] += time.perf_counter() - start
+        collection.upsert(
+            ids=[doc_id for doc_id, _, _ in batch],
+            documents=docs,
+            metadatas=[meta for _, _, meta in batch],
+            embeddings=embeddings
         )
+        print(f"📄 Embedded {len(batch)} chunks ({b + len(batch)}/{len(pending)})")
+    report["embed_seconds"] = round(report["embed_seconds"], 3)
+
+    # lexical (BM25) index and sentence export over every manual in the collection,
+    # not just this run's: other manuals keep their (unchanged) entries
+    data = collection.get(include=["documents", "metadatas"])
+    BM25Index.build(data["ids"], data["documents"], data["metadatas"]).save(BM25_INDEX_FILE)
+    old = {}
+    if os.path.exists(SECTIONS_FILE):
+        with open(SECTIONS_FILE, encoding="utf-8") as f:
+            old = json.load(f)
+    sections = {}
+    for doc_id, doc, meta in zip(data["ids"], data["documents"], data["metadatas"]):
+        sections[doc_id] = prepared.get(doc_id) or old.get(doc_id) \
+            or prepare_section(doc, (meta or {}).get("title", ""))
+    save_json(SECTIONS_FILE, sections)
+    export_vectors(collection)
 
-        # debug print
-        print(f"📄 Ingested section {i}: {title}")
+    if pending or removed or not os.path.exists(INGEST_STAMP_FILE):
+        mark_ingested()
+    report["total"] = len(chunks)
+    report["sections"] = sum(len(secs) for secs in manuals.values())
+    report["manuals"] = sorted(manuals)
+    return report
 
-    return len(sections)
+def export_vectors(collection):
+    """Dump the collection's embeddings + documents for arai_rag's numpy backend"""
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    VectorIndex.build(
+        data["ids"], data["embeddings"], data["documents"], data["metadatas"]
+    ).save(VECTOR_INDEX_PREFIX)
+
+def load_manuals(paths):
+    return {manual_name(p): list(iter_sections(iter_pages(p))) for p in paths}
+
+def save_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def mark_ingested():
+    with open(INGEST_STAMP_FILE, "w", encoding="utf-8") as f:
+        f.write(str(time.time()))
 
 if __name__ == "__main__":
-    text = load_manual(PDF_PATH)
-    sections = split_sections(text)
-    n = ingest_to_chroma(sections)
-    print(f"✅ Persisted {n} sections into Chroma at {CHROMA_DB_DIR}")
+    # python data_ingest.py [manual.pdf | directory]  (default: every PDF in MANUALS_DIR)
+    target = sys.argv[1] if len(sys.argv) > 1 else MANUALS_DIR
+    paths = manual_paths(target) if os.path.isdir(target) else [target]
+    report = ingest_to_chroma(load_manuals(paths))
+    print(
+        f"✅ Synced {report['sections']} sections / {report['total']} chunks from "
+        f"{', '.join(report['manuals'])} into Chroma at {CHROMA_DB_DIR} "
+        f"(added {report['added']}, updated {report['updated']}, deleted {report['deleted']}, "
+        f"skipped {report['skipped']}; embedding {report['embed_seconds']}s)"
+    )
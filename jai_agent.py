@@ -1,4 +1,7 @@
 # /SAP_FAN/jai_agent.py
+import os
+import threading
+import numpy as np
 import pandas as pd
 import json
 
@@ -17,23 +20,127 @@ def load_csv(path):
     return pd.read_csv(path, quotechar='"', skip_blank_lines=True)
 
 
+# ---------------- STORE ----------------
+def parse_skills(value):
+    if pd.isna(value):
+        return []
+    value = str(value).strip()
+    if value.lower() in ("", "nan"):
+        return []
+    return value.split(";")
+
+
+class JaiStore:
+    """
+    Performance CSV + career / nudge JSON loaded once and kept in memory.
+    Employees are indexed by employee_id (first row wins, like the old mask
+    lookup) with skills_unlocked pre-split. Each file is re-read only when its
+    mtime changes, so HR exports can be swapped in without a restart.
+    """
+
+    def __init__(self, performance_file=PERFORMANCE_FILE, career_file=CAREER_PATH_FILE, nudge_file=NUDGE_FILE):
+        self.paths = {"performance": performance_file, "career": career_file, "nudge": nudge_file}
+        self.mtimes = {}
+        self.employees = {}     # employee_id -> {"name", "role", "skills_raw", "skills", "skill_set"}
+        self._matrix = None     # (employee ids, skill -> column, employees x skills bool), built lazily
+        self.career = {}
+        self.nudges = {}
+        self._lock = threading.Lock()
+
+    def _load_performance(self, path):
+        df = load_csv(path).drop_duplicates("employee_id", keep="first")
+        employees = {}
+        for emp_id, name, role, raw in zip(df["employee_id"], df["name"], df["role"], df["skills_unlocked"]):
+            skills = parse_skills(raw)
+            employees[emp_id] = {
+                "name": name,
+                "role": role,
+                "skills_raw": raw,
+                "skills": skills,
+                "skill_set": set(skills),
+            }
+        self.employees = employees
+        self._matrix = None
+
+    def refresh(self):
+        """Reload whichever files changed on disk since the last load"""
+        mtimes = {key: os.stat(path).st_mtime_ns for key, path in self.paths.items()}
+        if mtimes == self.mtimes:
+            return
+        with self._lock:
+            for key, path in self.paths.items():
+                if self.mtimes.get(key) == mtimes[key]:
+                    continue
+                if key == "performance":
+                    self._load_performance(path)
+                elif key == "career":
+                    self.career = load_json(path)
+                else:
+                    self.nudges = load_json(path)
+                self.mtimes[key] = mtimes[key]
+
+    def employee(self, employee_id):
+        self.refresh()
+        return self.employees.get(employee_id)
+
+    def career_path(self, role):
+        self.refresh()
+        return self.career.get(role)
+
+    def nudge(self, skill, default=None):
+        self.refresh()
+        return self.nudges.get(skill, default)
+
+    def _skill_matrix(self):
+        # call with self._lock held
+        if self._matrix is None:
+            ids = list(self.employees)
+            columns = {}
+            for e in self.employees.values():
+                for skill in e["skills"]:
+                    columns.setdefault(skill, len(columns))
+            has = np.zeros((len(ids), len(columns)), dtype=bool)
+            for r, emp_id in enumerate(ids):
+                has[r, [columns[skill] for skill in self.employees[emp_id]["skills"]]] = True
+            self._matrix = (ids, columns, has)
+        return self._matrix
+
+    def skill_matrix(self):
+        """(employee ids, {skill: column}, employees x skills bool matrix) for bulk queries"""
+        self.refresh()
+        with self._lock:
+            return self._skill_matrix()
+
+    def snapshot(self):
+        """
+        Everything a bulk query needs, from one refresh and one lock:
+        {"employees", "career", "nudges", "matrix"} (matrix as skill_matrix()).
+        A reload replaces these objects instead of mutating them, so the
+        snapshot stays consistent while the caller works on it.
+        """
+        self.refresh()
+        with self._lock:
+            return {"employees": self.employees, "career": self.career,
+                    "nudges": self.nudges, "matrix": self._skill_matrix()}
+
+
+store = JaiStore()
+
+
 # ---------------- FEATURES ----------------
 def get_growth_path(employee_id):
-    df = load_csv(PERFORMANCE_FILE)
-    data = load_json(CAREER_PATH_FILE)
-
-    row = df[df["employee_id"] == employee_id]
+    row = store.employee(employee_id)
 
-    if row.empty:
+    if row is None:
         return f"❌ Employee ID {employee_id} not found."
-    row = row.iloc[0]
     current_role = row["role"]
 
-    if current_role not in data:
+    path = store.career_path(current_role)
+    if path is None:
         return f"❌ No career path info for {current_role}"
 
-    next_role = data[current_role]["next_role"]
-    skills = data[current_role]["skills_required"]
+    next_role = path["next_role"]
+    skills = path["skills_required"]
 
     return f"""
 👤 {row['name']}
@@ -44,26 +151,20 @@ Skills Required: {", ".join(skills)}
 
 
 def get_weekly_nudge(employee_id):
-    df = load_csv(PERFORMANCE_FILE)
-    career_data = load_json(CAREER_PATH_FILE)
-    nudge_data = load_json(NUDGE_FILE)
+    row = store.employee(employee_id)
 
-    row = df[df["employee_id"] == employee_id]
-
-    if row.empty:
+    if row is None:
         return f"❌ Employee ID {employee_id} not found."
 
-    row = row.iloc[0]
     current_role = row["role"]
-    skills = str(row.get("skills_unlocked", "") or "").strip()
-    unlocked = skills.split(";") if skills else []
-
+    unlocked = row["skill_set"]
 
-    if current_role not in career_data:
+    path = store.career_path(current_role)
+    if path is None:
         return f"❌ No career path info for {current_role}"
 
-    next_role = career_data[current_role]["next_role"]
-    required = career_data[current_role]["skills_required"]
+    next_role = path["next_role"]
+    required = path["skills_required"]
 
     # find first missing skill
     growth_skill = None
@@ -75,7 +176,7 @@ def get_weekly_nudge(employee_id):
     if not growth_skill:
         return f"✅ {row['name']} is fully ready for promotion to {next_role}!"
 
-    tip = nudge_data.get(growth_skill, "Keep practicing this skill!")
+    tip = store.nudge(growth_skill, "Keep practicing this skill!")
 
     return f"""
 🎯 Weekly Nudge for {row['name']}
@@ -86,17 +187,86 @@ Tip: {tip}
 
 
 def get_skill_tree(employee_id):
-    df = load_csv(PERFORMANCE_FILE)
-    row = df[df["employee_id"] == employee_id]
+    row = store.employee(employee_id)
 
-    if row.empty:
+    if row is None:
         return f"❌ Employee ID {employee_id} not found."
-    row = row.iloc[0]
-    skills = row["skills_unlocked"]
-    if pd.isna(skills) or str(skills).strip().lower() in ["", "nan"]:
+    if not row["skills"]:
         return f"❌ No skills unlocked yet."
     else:
-        return f"👤 Skill Acquired: {skills}"
+        return f"👤 Skill Acquired: {row['skills_raw']}"
+
+
+# ---------------- TEAM (BULK) ----------------
+def get_team_growth(role=None, ready=None):
+    """
+    Growth status of every employee in one pass per role over the
+    employee x skill matrix. Returns a list of dicts:
+    employee_id, name, role, next_role, skills_required, missing_skills,
+    growth_skill (first missing, in career-path order), tip, progress, ready.
+    role: only that role; ready: True / False keeps only (not) promotion-ready.
+    Employees whose role has no career path get next_role None and ready None.
+    """
+    snap = store.snapshot()
+    employees, nudges = snap["employees"], snap["nudges"]
+    ids, columns, has = snap["matrix"]
+    roles = np.array([employees[emp_id]["role"] for emp_id in ids], dtype=object)
+
+    results = []
+    for current_role in dict.fromkeys(roles.tolist()):
+        if role is not None and current_role != role:
+            continue
+        rows = np.flatnonzero(roles == current_role)
+        path = snap["career"].get(current_role)
+        if path is None:
+            if ready is not None:
+                continue
+            for r in rows:
+                e = employees[ids[r]]
+                results.append({
+                    "employee_id": ids[r], "name": e["name"], "role": current_role,
+                    "next_role": None, "skills_required": [], "missing_skills": [],
+                    "growth_skill": None, "tip": None, "progress": None, "ready": None,
+                })
+            continue
+
+        required = path["skills_required"]
+        # skills nobody has unlocked yet have no column: missing for everyone
+        req = np.zeros((len(rows), len(required)), dtype=bool)
+        known = [k for k, skill in enumerate(required) if skill in columns]
+        if known:
+            req[:, known] = has[np.ix_(rows, [columns[required[k]] for k in known])]
+        missing = ~req
+        is_ready = ~missing.any(axis=1)
+        first = missing.argmax(axis=1) if required else np.zeros(len(rows), dtype=int)
+        progress = req.mean(axis=1) if required else np.ones(len(rows))
+
+        for n, r in enumerate(rows):
+            if ready is not None and bool(is_ready[n]) != ready:
+                continue
+            e = employees[ids[r]]
+            growth_skill = None if is_ready[n] else required[first[n]]
+            results.append({
+                "employee_id": ids[r],
+                "name": e["name"],
+                "role": current_role,
+                "next_role": path["next_role"],
+                "skills_required": required,
+                "missing_skills": [required[k] for k in np.flatnonzero(missing[n])],
+                "growth_skill": growth_skill,
+                "tip": nudges.get(growth_skill, "Keep practicing this skill!") if growth_skill else None,
+                "progress": round(float(progress[n]), 4),
+                "ready": bool(is_ready[n]),
+            })
+    return results
+
+
+def get_team_nudges(role=None):
+    """Weekly nudges for everyone who still has a skill to grow (structured get_weekly_nudge)"""
+    return [
+        {k: r[k] for k in ("employee_id", "name", "role", "next_role", "growth_skill", "tip")}
+        for r in get_team_growth(role=role, ready=False)
+    ]
 
 
 # ---------------- MENU ----------------
@@ -1,12 +1,12 @@
 # /SAP_FAN/kai_agent.py
+import os
 import pandas as pd
 import json
 from datetime import datetime
+from kai_store import get_store, get_summary_view
 
 # ---------------- CONFIG ----------------
-IDEAS_FILE = "ideas.csv"
 CHALLENGES_FILE = "challenges.json"
-KUDOS_FILE = "kudos.csv"
 
 
 # ---------------- HELPERS ----------------
@@ -14,47 +14,34 @@ def load_json(path):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_csv(path):
-    return pd.read_csv(path)
+_challenge_cache = {"mtime": None, "data": None}
 
-def save_csv(df, path):
-    df.to_csv(path, index=False)
+def current_challenge():
+    # challenges.json only changes when a new challenge is announced: re-read on mtime change
+    mtime = os.stat(CHALLENGES_FILE).st_mtime_ns
+    if _challenge_cache["mtime"] != mtime:
+        _challenge_cache["data"] = load_json(CHALLENGES_FILE)["current_challenge"]
+        _challenge_cache["mtime"] = mtime
+    return _challenge_cache["data"]
 
 
 # ---------------- FEATURES ----------------
 def submit_idea(idea_text, employee, branch):
-    try:
-        df = load_csv(IDEAS_FILE)
-    except FileNotFoundError:
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-
-    new_row = pd.DataFrame([{
-        "idea_id": len(df) + 1,
-        "idea_text": idea_text,
-        "submitted_by": employee,
-        "branch_id": branch,
-        "upvotes": 1,
-        "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-    }])
-
-    df = pd.concat([df, new_row], ignore_index=True)
-    save_csv(df, IDEAS_FILE)
+    idea_id = get_store().add_idea(idea_text, employee, branch)
+    get_summary_view().idea_changed(idea_id)
     return f"💡 Idea submitted: '{idea_text}' by {employee} (branch {branch})"
 
 
 
 def upvote_idea(idea_id):
-    df = load_csv(IDEAS_FILE)
-    if idea_id not in df["idea_id"].values:
+    if not get_store().upvote(idea_id):
         return f"❌ Idea {idea_id} not found"
-    df.loc[df["idea_id"] == idea_id, "upvotes"] += 1
-    save_csv(df, IDEAS_FILE)
+    get_summary_view().idea_changed(idea_id)
     return f"👍 Upvoted idea {idea_id}"
 
 
 def view_challenge():
-    data = load_json(CHALLENGES_FILE)
-    ch = data["current_challenge"]
+    ch = current_challenge()
     return f"""
 🏆 Current Challenge
 Title: {ch['title']}
@@ -65,27 +52,27 @@ Prize: {ch['prize']}
 kudos_log = []  # เก็บ kudos ไว้ชั่วคราว
 
 def post_kudos(from_emp, to_emp, message):
-    path = "kudos.csv"
-    df = load_csv(path)
-    new_row = {
-        "kudos_id": len(df) + 1,
-        "from_employee": from_emp,
-        "to_employee": to_emp,
-        "message": message,
-        "timestamp": pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    # Instead of df.append(new_row, ignore_index=True)
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    save_csv(df, path)
+    kudos_id = get_store().add_kudos(from_emp, to_emp, message)
+    get_summary_view().kudos_added(kudos_id)
     return f"✅ Kudos posted from {from_emp} to {to_emp}!"
 
 def view_kudos():
     return kudos_log
 
-def manager_summary():
-    ideas = load_csv(IDEAS_FILE).sort_values(by="upvotes", ascending=False).head(5)
-    kudos = load_csv(KUDOS_FILE).tail(5)
-    ch = load_json(CHALLENGES_FILE)["current_challenge"]
+def manager_summary_data():
+    """Top ideas, recent kudos and the current challenge as plain dicts"""
+    view = get_summary_view().snapshot()
+    return {
+        "top_ideas": [{k: i[k] for k in ("idea_id", "idea_text", "upvotes")} for i in view["top_ideas"]],
+        "recent_kudos": [{k: r[k] for k in ("from_employee", "to_employee", "message")} for r in view["recent_kudos"]],
+        "challenge": current_challenge(),
+    }
+
+def manager_summary(data=None):
+    data = data or manager_summary_data()
+    ideas = pd.DataFrame(data["top_ideas"], columns=["idea_id", "idea_text", "upvotes"])
+    kudos = pd.DataFrame(data["recent_kudos"], columns=["from_employee", "to_employee", "message"])
+    ch = data["challenge"]
 
     return f"""
 📊 Manager Summary
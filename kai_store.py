@@ -0,0 +1,842 @@
+# kai_store.py
+import atexit
+import base64
+import csv
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# ---------------- CONFIG ----------------
+STORE_BACKEND = os.getenv("KAI_STORE", "sqlite")     # "sqlite" or "csv" (the original files)
+DB_FILE = os.getenv("KAI_DB_FILE", "kai.db")
+IDEAS_FILE = "ideas.csv"
+KUDOS_FILE = "kudos.csv"
+BUSY_TIMEOUT_MS = 5000
+# write-behind upvotes: acknowledged in memory, written in batches
+UPVOTE_BUFFER = os.getenv("KAI_UPVOTE_BUFFER", "1") == "1"
+FLUSH_SIZE = int(os.getenv("KAI_UPVOTE_FLUSH_SIZE", "100"))               # pending upvotes
+FLUSH_INTERVAL = float(os.getenv("KAI_UPVOTE_FLUSH_INTERVAL", "2.0"))     # seconds
+SUMMARY_SIZE = 5         # top ideas / recent kudos in the manager summary
+# the summary view is kept up to date by this process's writes; rebuild it from
+# the store this often to pick up writes from other workers
+SUMMARY_REFRESH = float(os.getenv("KAI_SUMMARY_REFRESH", "30"))
+# ----------------------------------------
+
+IDEA_COLUMNS = ["idea_id", "idea_text", "submitted_by", "branch_id", "upvotes", "timestamp"]
+KUDOS_COLUMNS = ["kudos_id", "from_employee", "to_employee", "message", "timestamp"]
+
+
+def now_str():
+    return pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def to_epoch(value):
+    """Timestamp as stored (epoch number or "YYYY-MM-DD HH:MM:SS" local time) -> epoch seconds"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        return ts.timestamp()
+    return time.mktime(ts.to_pydatetime().timetuple())
+
+
+# ---------------- PAGINATION ----------------
+IDEA_SORTS = ("recent", "oldest", "upvotes")
+KUDOS_SORTS = ("recent", "oldest")
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _check_page(sort, sorts, limit):
+    if sort not in sorts:
+        raise ValueError(f"Unknown sort: {sort} (use one of {', '.join(sorts)})")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+# ---------------- SQLITE ----------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ideas (
+    idea_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    idea_text    TEXT NOT NULL,
+    submitted_by TEXT,
+    branch_id    TEXT,
+    upvotes      INTEGER NOT NULL DEFAULT 0,
+    timestamp,
+    created_at   REAL,
+    updated_seq  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ideas_upvotes ON ideas (upvotes DESC, idea_id);
+CREATE INDEX IF NOT EXISTS idx_ideas_branch ON ideas (branch_id);
+CREATE TABLE IF NOT EXISTS kudos (
+    kudos_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    from_employee TEXT,
+    to_employee   TEXT,
+    message       TEXT,
+    timestamp,
+    created_at    REAL,
+    seq           INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_kudos_to ON kudos (to_employee);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('seq', 0), ('updated_at', 0);
+"""
+
+# columns added to kai.db files created before change tracking and date filters existed
+MIGRATIONS = [
+    ("ideas", "created_at", "REAL"),
+    ("ideas", "updated_seq", "INTEGER NOT NULL DEFAULT 0"),
+    ("kudos", "created_at", "REAL"),
+    ("kudos", "seq", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_ideas_submitter ON ideas (submitted_by);
+CREATE INDEX IF NOT EXISTS idx_ideas_created ON ideas (created_at);
+CREATE INDEX IF NOT EXISTS idx_ideas_seq ON ideas (updated_seq);
+CREATE INDEX IF NOT EXISTS idx_kudos_from ON kudos (from_employee);
+CREATE INDEX IF NOT EXISTS idx_kudos_created ON kudos (created_at);
+CREATE INDEX IF NOT EXISTS idx_kudos_seq ON kudos (seq);
+"""
+
+IDEA_SELECT = "SELECT " + ", ".join(IDEA_COLUMNS) + " FROM ideas"
+KUDOS_SELECT = "SELECT " + ", ".join(KUDOS_COLUMNS) + " FROM kudos"
+
+
+class SQLiteStore:
+    """
+    Ideas / kudos in one SQLite file (WAL, one connection per thread).
+    Ids come from AUTOINCREMENT and upvotes are a single UPDATE, so concurrent
+    requests can neither lose votes nor hand out the same id twice.
+    Every write bumps a change sequence (meta.seq) stamped on the rows it
+    touched, which drives ETags and changes().
+    An empty database imports ideas.csv / kudos.csv once on first open.
+    """
+
+    def __init__(self, path=DB_FILE, ideas_csv=IDEAS_FILE, kudos_csv=KUDOS_FILE):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            conn.executescript(INDEXES)
+        self._import_once(ideas_csv, kudos_csv)
+
+    def _import_once(self, ideas_csv, kudos_csv):
+        """
+        Import the CSVs into an empty database, in one transaction.
+        BEGIN IMMEDIATE takes the write lock before the emptiness check, so when
+        several workers open a new kai.db at once only the first one imports.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.is_empty():
+                for r in csv_ideas(ideas_csv):
+                    self._insert_idea(conn, **r)
+                for r in csv_kudos(kudos_csv):
+                    self._insert_kudos(conn, **r)
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        for table, column, decl in MIGRATIONS:
+            columns = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+            if column in columns:
+                continue
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+            if column in ("updated_seq", "seq"):
+                # existing rows count as one change, so changes(since=0) still returns them
+                conn.execute(f"UPDATE {table} SET {column} = 1")
+                conn.execute("UPDATE meta SET value = MAX(value, 1) WHERE key = 'seq'")
+            if column == "created_at":
+                key = "idea_id" if table == "ideas" else "kudos_id"
+                conn.executemany(
+                    f"UPDATE {table} SET created_at = ? WHERE {key} = ?",
+                    [(to_epoch(r["timestamp"]), r[key]) for r in conn.execute(f"SELECT {key}, timestamp FROM {table}")],
+                )
+
+    @staticmethod
+    def _bump(conn):
+        """Next change sequence number (call inside the write transaction)"""
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'seq'")
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'updated_at'", (time.time(),))
+        return conn.execute("SELECT value FROM meta WHERE key = 'seq'").fetchone()[0]
+
+    def is_empty(self):
+        conn = self._conn()
+        return not conn.execute("SELECT 1 FROM ideas LIMIT 1").fetchone() \
+            and not conn.execute("SELECT 1 FROM kudos LIMIT 1").fetchone()
+
+    def version(self):
+        """(change seq, last write epoch) without touching the data tables"""
+        meta = dict(self._conn().execute("SELECT key, value FROM meta").fetchall())
+        return int(meta["seq"]), float(meta["updated_at"])
+
+    # ---------- ideas ----------
+    @classmethod
+    def _insert_idea(cls, conn, idea_text, submitted_by, branch_id, upvotes=1, timestamp=None, idea_id=None):
+        timestamp = timestamp or now_str()
+        cur = conn.execute(
+            "INSERT INTO ideas (idea_id, idea_text, submitted_by, branch_id, upvotes, timestamp, "
+            "created_at, updated_seq) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (idea_id, idea_text, submitted_by, branch_id, upvotes, timestamp,
+             to_epoch(timestamp), cls._bump(conn)),
+        )
+        return cur.lastrowid
+
+    def add_idea(self, idea_text, submitted_by, branch_id, upvotes=1, timestamp=None, idea_id=None):
+        with self._conn() as conn:
+            return self._insert_idea(conn, idea_text, submitted_by, branch_id, upvotes, timestamp, idea_id)
+
+    def upvote(self, idea_id, n=1):
+        """Atomically add n upvotes; False if the idea does not exist"""
+        with self._conn() as conn:
+            cur = conn.execute("UPDATE ideas SET upvotes = upvotes + ?, updated_seq = ? WHERE idea_id = ?",
+                               (n, self._bump(conn), idea_id))
+            return cur.rowcount > 0
+
+    def upvote_many(self, deltas):
+        """Apply {idea_id: n} in one transaction"""
+        with self._conn() as conn:
+            seq = self._bump(conn)
+            conn.executemany("UPDATE ideas SET upvotes = upvotes + ?, updated_seq = ? WHERE idea_id = ?",
+                             [(n, seq, idea_id) for idea_id, n in deltas.items()])
+
+    def has_idea(self, idea_id):
+        return self._conn().execute("SELECT 1 FROM ideas WHERE idea_id = ?", (idea_id,)).fetchone() is not None
+
+    def get_idea(self, idea_id):
+        row = self._conn().execute(f"{IDEA_SELECT} WHERE idea_id = ?", (idea_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_ideas(self):
+        return [dict(r) for r in self._conn().execute(f"{IDEA_SELECT} ORDER BY idea_id")]
+
+    def top_ideas(self, k=5):
+        return [dict(r) for r in self._conn().execute(
+            f"{IDEA_SELECT} ORDER BY upvotes DESC, idea_id LIMIT ?", (k,))]
+
+    def query_ideas(self, branch_id=None, submitted_by=None, since=None, until=None,
+                    sort="recent", cursor=None, limit=50):
+        """One page of ideas -> (rows, next cursor or None)"""
+        _check_page(sort, IDEA_SORTS, limit)
+        where, args = [], []
+        for column, value in (("branch_id", branch_id), ("submitted_by", submitted_by)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(to_epoch(since))
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(to_epoch(until))
+        if cursor:
+            key = decode_cursor(cursor)
+            if sort == "upvotes":
+                where.append("(upvotes < ? OR (upvotes = ? AND idea_id > ?))")
+                args += [key[0], key[0], key[1]]
+            else:
+                where.append("idea_id < ?" if sort == "recent" else "idea_id > ?")
+                args.append(key[-1])
+        order = {"recent": "idea_id DESC", "oldest": "idea_id", "upvotes": "upvotes DESC, idea_id"}[sort]
+        sql = f"{IDEA_SELECT}{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order} LIMIT ?"
+        rows = [dict(r) for r in self._conn().execute(sql, args + [limit + 1])]
+        return _page(rows, limit, lambda r: [r["upvotes"], r["idea_id"]])
+
+    # ---------- kudos ----------
+    @classmethod
+    def _insert_kudos(cls, conn, from_employee, to_employee, message, timestamp=None, kudos_id=None):
+        timestamp = timestamp or now_str()
+        cur = conn.execute(
+            "INSERT INTO kudos (kudos_id, from_employee, to_employee, message, timestamp, created_at, seq) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (kudos_id, from_employee, to_employee, message, timestamp,
+             to_epoch(timestamp), cls._bump(conn)),
+        )
+        return cur.lastrowid
+
+    def add_kudos(self, from_employee, to_employee, message, timestamp=None, kudos_id=None):
+        with self._conn() as conn:
+            return self._insert_kudos(conn, from_employee, to_employee, message, timestamp, kudos_id)
+
+    def get_kudos(self, kudos_id):
+        row = self._conn().execute(f"{KUDOS_SELECT} WHERE kudos_id = ?", (kudos_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_kudos(self):
+        return [dict(r) for r in self._conn().execute(f"{KUDOS_SELECT} ORDER BY kudos_id")]
+
+    def recent_kudos(self, k=5):
+        rows = self._conn().execute(f"{KUDOS_SELECT} ORDER BY kudos_id DESC LIMIT ?", (k,))
+        return [dict(r) for r in rows][::-1]
+
+    def query_kudos(self, from_employee=None, to_employee=None, since=None, until=None,
+                    sort="recent", cursor=None, limit=50):
+        """One page of kudos -> (rows, next cursor or None)"""
+        _check_page(sort, KUDOS_SORTS, limit)
+        where, args = [], []
+        for column, value in (("from_employee", from_employee), ("to_employee", to_employee)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            args.append(to_epoch(since))
+        if until is not None:
+            where.append("created_at < ?")
+            args.append(to_epoch(until))
+        if cursor:
+            where.append("kudos_id < ?" if sort == "recent" else "kudos_id > ?")
+            args.append(decode_cursor(cursor)[-1])
+        order = "kudos_id DESC" if sort == "recent" else "kudos_id"
+        sql = f"{KUDOS_SELECT}{' WHERE ' + ' AND '.join(where) if where else ''} ORDER BY {order} LIMIT ?"
+        rows = [dict(r) for r in self._conn().execute(sql, args + [limit + 1])]
+        return _page(rows, limit, lambda r: [r["kudos_id"]])
+
+    # ---------- changes ----------
+    def changes(self, since=0, limit=MAX_PAGE_SIZE):
+        """
+        Ideas (new or upvoted) and kudos written after change seq `since`, oldest
+        change first. Returns {"seq", "ideas", "kudos", "more", "full"}; pass the
+        returned seq back as the next `since` (when "more", ask again right away).
+        Rows stamped by one write are never split: a page can exceed limit for them.
+        """
+        _check_page("recent", KUDOS_SORTS, limit)
+        conn = self._conn()
+        seq, _ = self.version()
+        ideas = conn.execute(
+            f"SELECT {', '.join(IDEA_COLUMNS)}, updated_seq AS seq FROM ideas "
+            "WHERE updated_seq > ? ORDER BY updated_seq LIMIT ?", (since, limit + 1)).fetchall()
+        kudos = conn.execute(
+            f"SELECT {', '.join(KUDOS_COLUMNS)}, seq FROM kudos "
+            "WHERE seq > ? ORDER BY seq LIMIT ?", (since, limit + 1)).fetchall()
+        ideas, kudos = [dict(r) for r in ideas], [dict(r) for r in kudos]
+        more = len(ideas) > limit or len(kudos) > limit
+        if more:
+            # stop at the lowest seq where either list was cut, so nothing is skipped
+            cut = min(rows[limit]["seq"] for rows in (ideas, kudos) if len(rows) > limit)
+            ideas = [r for r in ideas if r["seq"] < cut]
+            kudos = [r for r in kudos if r["seq"] < cut]
+            seq = cut - 1
+            if not ideas and not kudos:
+                # one write (upvote_many, the migration backfill) stamped more than limit
+                # rows: return that whole seq group, or the client would never get past it
+                ideas = [dict(r) for r in conn.execute(
+                    f"SELECT {', '.join(IDEA_COLUMNS)}, updated_seq AS seq FROM ideas WHERE updated_seq = ?",
+                    (cut,))]
+                kudos = [dict(r) for r in conn.execute(
+                    f"SELECT {', '.join(KUDOS_COLUMNS)}, seq FROM kudos WHERE seq = ?", (cut,))]
+                seq = cut
+        for r in ideas + kudos:
+            del r["seq"]
+        return {"seq": seq, "ideas": ideas, "kudos": kudos, "more": more, "full": False}
+
+
+def _page(rows, limit, key):
+    """rows were fetched with limit + 1: trim and build the next cursor"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+# ---------------- CSV ----------------
+class CSVStore:
+    """
+    The original CSV files behind the same interface. Every write rewrites the
+    whole file, so it is only serialised within one process (a lock) and ids
+    are max + 1 instead of len + 1. Queries filter in memory, and there is no
+    change sequence: version() is the files' mtime and changes() always
+    returns everything ("full": True).
+    """
+
+    def __init__(self, ideas_csv=IDEAS_FILE, kudos_csv=KUDOS_FILE):
+        self.ideas_csv = ideas_csv
+        self.kudos_csv = kudos_csv
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load(path, columns):
+        try:
+            return pd.read_csv(path)
+        except FileNotFoundError:
+            return pd.DataFrame(columns=columns)
+
+    @staticmethod
+    def _records(df):
+        return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+    @staticmethod
+    def _next_id(df, column):
+        return int(df[column].max()) + 1 if len(df) else 1
+
+    def version(self):
+        mtimes = [os.stat(p).st_mtime_ns for p in (self.ideas_csv, self.kudos_csv) if os.path.exists(p)]
+        latest = max(mtimes) if mtimes else 0
+        return latest, latest / 1e9
+
+    def add_idea(self, idea_text, submitted_by, branch_id, upvotes=1, timestamp=None, idea_id=None):
+        with self._lock:
+            df = self._load(self.ideas_csv, IDEA_COLUMNS)
+            idea_id = idea_id or self._next_id(df, "idea_id")
+            row = {"idea_id": idea_id, "idea_text": idea_text, "submitted_by": submitted_by,
+                   "branch_id": branch_id, "upvotes": upvotes, "timestamp": timestamp or now_str()}
+            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+            df.to_csv(self.ideas_csv, index=False)
+            return idea_id
+
+    def upvote(self, idea_id, n=1):
+        with self._lock:
+            df = self._load(self.ideas_csv, IDEA_COLUMNS)
+            if idea_id not in df["idea_id"].values:
+                return False
+            df.loc[df["idea_id"] == idea_id, "upvotes"] += n
+            df.to_csv(self.ideas_csv, index=False)
+            return True
+
+    def upvote_many(self, deltas):
+        with self._lock:
+            df = self._load(self.ideas_csv, IDEA_COLUMNS)
+            df["upvotes"] += df["idea_id"].map(deltas).fillna(0).astype(df["upvotes"].dtype)
+            df.to_csv(self.ideas_csv, index=False)
+
+    def has_idea(self, idea_id):
+        return idea_id in self._load(self.ideas_csv, IDEA_COLUMNS)["idea_id"].values
+
+    def get_idea(self, idea_id):
+        df = self._load(self.ideas_csv, IDEA_COLUMNS)
+        rows = self._records(df[df["idea_id"] == idea_id])
+        return rows[0] if rows else None
+
+    def list_ideas(self):
+        return self._records(self._load(self.ideas_csv, IDEA_COLUMNS))
+
+    def top_ideas(self, k=5):
+        df = self._load(self.ideas_csv, IDEA_COLUMNS)
+        return self._records(df.sort_values(by=["upvotes", "idea_id"], ascending=[False, True]).head(k))
+
+    def add_kudos(self, from_employee, to_employee, message, timestamp=None, kudos_id=None):
+        with self._lock:
+            df = self._load(self.kudos_csv, KUDOS_COLUMNS)
+            kudos_id = kudos_id or self._next_id(df, "kudos_id")
+            row = {"kudos_id": kudos_id, "from_employee": from_employee, "to_employee": to_employee,
+                   "message": message, "timestamp": timestamp or now_str()}
+            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+            df.to_csv(self.kudos_csv, index=False)
+            return kudos_id
+
+    def get_kudos(self, kudos_id):
+        df = self._load(self.kudos_csv, KUDOS_COLUMNS)
+        rows = self._records(df[df["kudos_id"] == kudos_id])
+        return rows[0] if rows else None
+
+    def list_kudos(self):
+        return self._records(self._load(self.kudos_csv, KUDOS_COLUMNS))
+
+    def recent_kudos(self, k=5):
+        return self._records(self._load(self.kudos_csv, KUDOS_COLUMNS).tail(k))
+
+    @staticmethod
+    def _filter(rows, filters, since, until):
+        since, until = to_epoch(since), to_epoch(until)
+        out = []
+        for r in rows:
+            if any(v is not None and r[k] != v for k, v in filters.items()):
+                continue
+            created = to_epoch(r["timestamp"])
+            if (since is not None and (created is None or created < since)) or \
+                    (until is not None and (created is None or created >= until)):
+                continue
+            out.append(r)
+        return out
+
+    def query_ideas(self, branch_id=None, submitted_by=None, since=None, until=None,
+                    sort="recent", cursor=None, limit=50):
+        _check_page(sort, IDEA_SORTS, limit)
+        rows = self._filter(self.list_ideas(), {"branch_id": branch_id, "submitted_by": submitted_by}, since, until)
+        if sort == "upvotes":
+            rows.sort(key=lambda r: (-r["upvotes"], r["idea_id"]))
+            if cursor:
+                votes, last = decode_cursor(cursor)
+                rows = [r for r in rows if (-r["upvotes"], r["idea_id"]) > (-votes, last)]
+        else:
+            rows.sort(key=lambda r: r["idea_id"], reverse=sort == "recent")
+            if cursor:
+                last = decode_cursor(cursor)[-1]
+                rows = [r for r in rows if (r["idea_id"] < last if sort == "recent" else r["idea_id"] > last)]
+        return _page(rows[:limit + 1], limit, lambda r: [r["upvotes"], r["idea_id"]])
+
+    def query_kudos(self, from_employee=None, to_employee=None, since=None, until=None,
+                    sort="recent", cursor=None, limit=50):
+        _check_page(sort, KUDOS_SORTS, limit)
+        rows = self._filter(self.list_kudos(), {"from_employee": from_employee, "to_employee": to_employee},
+                            since, until)
+        rows.sort(key=lambda r: r["kudos_id"], reverse=sort == "recent")
+        if cursor:
+            last = decode_cursor(cursor)[-1]
+            rows = [r for r in rows if (r["kudos_id"] < last if sort == "recent" else r["kudos_id"] > last)]
+        return _page(rows[:limit + 1], limit, lambda r: [r["kudos_id"]])
+
+    def changes(self, since=0, limit=MAX_PAGE_SIZE):
+        seq, _ = self.version()
+        if since >= seq:
+            return {"seq": seq, "ideas": [], "kudos": [], "more": False, "full": False}
+        return {"seq": seq, "ideas": self.list_ideas(), "kudos": self.list_kudos(), "more": False, "full": True}
+
+
+# ---------------- WRITE-BEHIND UPVOTES ----------------
+class BufferedStore:
+    """
+    Wraps a store so upvote() only checks the idea exists (against a set of
+    known ids, loaded once and kept up to date by add_idea) and bumps an
+    in-memory counter. Counters are coalesced per idea_id and written with
+    upvote_many() once FLUSH_SIZE upvotes are pending, every FLUSH_INTERVAL
+    seconds, and on close() (API shutdown / interpreter exit).
+    Idea reads add the pending deltas, so counts look live.
+    """
+
+    def __init__(self, store, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.store = store
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = {}       # idea_id -> upvotes not yet written
+        self.pending_total = 0
+        self.flushes = 0
+        self.generation = 0     # bumped on every buffered upvote (part of version())
+        self.last_upvote = 0.0
+        self.known_ids = {i["idea_id"] for i in store.list_ideas()}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="kai-upvote-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __getattr__(self, name):
+        # everything that is not about upvotes goes straight to the store
+        return getattr(self.store, name)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Upvote flush failed, will retry: {e}")
+
+    def add_idea(self, *args, **kwargs):
+        idea_id = self.store.add_idea(*args, **kwargs)
+        with self._lock:
+            self.known_ids.add(idea_id)
+        return idea_id
+
+    def upvote(self, idea_id, n=1):
+        if idea_id not in self.known_ids:
+            # may have been added by another worker process since we loaded
+            if not self.store.has_idea(idea_id):
+                return False
+            with self._lock:
+                self.known_ids.add(idea_id)
+        with self._lock:
+            self.pending[idea_id] = self.pending.get(idea_id, 0) + n
+            self.pending_total += n
+            self.generation += 1
+            self.last_upvote = time.time()
+            full = self.pending_total >= self.flush_size
+        if full:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write pending upvotes; returns how many ideas were updated"""
+        with self._flush_lock:
+            with self._lock:
+                deltas, self.pending, self.pending_total = self.pending, {}, 0
+            if not deltas:
+                return 0
+            try:
+                self.store.upvote_many(deltas)
+            except Exception:
+                # put them back so nothing is lost
+                with self._lock:
+                    for idea_id, n in deltas.items():
+                        self.pending[idea_id] = self.pending.get(idea_id, 0) + n
+                        self.pending_total += n
+                raise
+            self.flushes += 1
+            return len(deltas)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _with_pending(self, ideas):
+        with self._lock:
+            pending = dict(self.pending)
+        for idea in ideas:
+            idea["upvotes"] += pending.get(idea["idea_id"], 0)
+        return ideas
+
+    def get_idea(self, idea_id):
+        idea = self.store.get_idea(idea_id)
+        return self._with_pending([idea])[0] if idea else None
+
+    def list_ideas(self):
+        return self._with_pending(self.store.list_ideas())
+
+    def top_ideas(self, k=5):
+        # only ideas with pending votes can overtake the stored top k
+        with self._lock:
+            extra = list(self.pending)
+        ideas = {i["idea_id"]: i for i in self.store.top_ideas(k)}
+        for idea_id in extra:
+            if idea_id not in ideas:
+                idea = self.store.get_idea(idea_id)
+                if idea:
+                    ideas[idea_id] = idea
+        ranked = sorted(self._with_pending(list(ideas.values())), key=lambda i: (-i["upvotes"], i["idea_id"]))
+        return ranked[:k]
+
+    def query_ideas(self, *args, **kwargs):
+        # pending votes are added to the page; upvote order catches up at the next flush
+        rows, cursor = self.store.query_ideas(*args, **kwargs)
+        return self._with_pending(rows), cursor
+
+    def changes(self, since=0, limit=MAX_PAGE_SIZE):
+        # buffered votes become changes when they are flushed
+        result = self.store.changes(since, limit)
+        self._with_pending(result["ideas"])
+        return result
+
+    def version(self):
+        seq, updated_at = self.store.version()
+        with self._lock:
+            return f"{seq}.{self.generation}", max(updated_at, self.last_upvote)
+
+    def stats(self):
+        with self._lock:
+            return {"pending_ideas": len(self.pending), "pending_upvotes": self.pending_total,
+                    "flushes": self.flushes}
+
+
+# ---------------- MANAGER SUMMARY ----------------
+class SummaryView:
+    """
+    Materialized manager summary: the k most upvoted ideas and the k latest
+    kudos, updated on every write instead of re-reading the store.
+    Upvotes only ever grow, so an idea can only enter the top k when its own
+    count changes: idea_changed() re-reads that one row and compares it with
+    the current k-th idea.
+    """
+
+    def __init__(self, store, k=SUMMARY_SIZE, refresh=SUMMARY_REFRESH):
+        self.store = store
+        self.k = k
+        self.refresh = refresh
+        self.top = {}                   # idea_id -> idea row
+        self.kudos = deque(maxlen=k)
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.top = {i["idea_id"]: i for i in self.store.top_ideas(self.k)}
+        self.kudos = deque(self.store.recent_kudos(self.k), maxlen=self.k)
+        self.loaded_at = time.monotonic()
+
+    def _check(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.refresh:
+            self._load()
+
+    @staticmethod
+    def _rank(idea):
+        return (-idea["upvotes"], idea["idea_id"])
+
+    def idea_changed(self, idea_id):
+        """Call after an idea is added or upvoted"""
+        with self._lock:
+            # read under the lock: a slower caller must not put back an older count
+            idea = self.store.get_idea(idea_id)
+            if idea is None:
+                return
+            self._check()
+            if idea_id in self.top or len(self.top) < self.k:
+                self.top[idea_id] = idea
+                return
+            last = max(self.top.values(), key=self._rank)
+            if self._rank(idea) < self._rank(last):
+                del self.top[last["idea_id"]]
+                self.top[idea_id] = idea
+
+    def kudos_added(self, kudos_id):
+        kudos = self.store.get_kudos(kudos_id)
+        if kudos is None:
+            return
+        with self._lock:
+            self._check()
+            # a reload in _check() has already read this row
+            if all(k["kudos_id"] != kudos_id for k in self.kudos):
+                self.kudos.append(kudos)
+
+    def snapshot(self):
+        """{"top_ideas": [...], "recent_kudos": [...]} (best idea first, oldest kudos first)"""
+        with self._lock:
+            self._check()
+            return {
+                "top_ideas": sorted((dict(i) for i in self.top.values()), key=self._rank),
+                "recent_kudos": [dict(k) for k in self.kudos],
+            }
+
+
+# ---------------- IMPORT ----------------
+def _csv_rows(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+def _number(value):
+    try:
+        return float(value) if "." in value else int(value)
+    except (TypeError, ValueError):
+        return value
+
+def csv_ideas(path=IDEAS_FILE):
+    """ideas.csv rows as add_idea() keyword arguments (ids, votes and timestamps kept)"""
+    return [dict(idea_text=r["idea_text"], submitted_by=r["submitted_by"], branch_id=r["branch_id"],
+                 upvotes=int(float(r["upvotes"] or 0)), timestamp=_number(r["timestamp"]),
+                 idea_id=int(r["idea_id"]))
+            for r in _csv_rows(path)]
+
+def csv_kudos(path=KUDOS_FILE):
+    """kudos.csv rows as add_kudos() keyword arguments"""
+    return [dict(from_employee=r["from_employee"], to_employee=r["to_employee"], message=r["message"],
+                 timestamp=_number(r["timestamp"]), kudos_id=int(r["kudos_id"]))
+            for r in _csv_rows(path)]
+
+def import_csv(store, ideas_csv=IDEAS_FILE, kudos_csv=KUDOS_FILE):
+    """Copy ideas.csv / kudos.csv into store keeping ids, votes and timestamps"""
+    ideas = csv_ideas(ideas_csv)
+    for r in ideas:
+        store.add_idea(**r)
+    kudos = csv_kudos(kudos_csv)
+    for r in kudos:
+        store.add_kudos(**r)
+    return {"ideas": len(ideas), "kudos": len(kudos)}
+
+
+# ---------------- STORE ----------------
+_store = None
+_store_lock = threading.Lock()
+
+def open_store(backend=None, buffered=UPVOTE_BUFFER):
+    backend = backend or STORE_BACKEND
+    if backend == "sqlite":
+        store = SQLiteStore()
+    elif backend == "csv":
+        store = CSVStore()
+    else:
+        raise ValueError(f"Unknown Kai store backend: {backend}")
+    return BufferedStore(store) if buffered else store
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_store()
+    return _store
+
+_summary = None
+
+def get_summary_view():
+    global _summary
+    if _summary is None:
+        store = get_store()
+        with _store_lock:
+            if _summary is None:
+                _summary = SummaryView(store)
+    return _summary
+
+def close():
+    """Flush buffered upvotes (called on API shutdown)"""
+    if isinstance(_store, BufferedStore):
+        _store.close()
+
+
+# ---------------- STRESS CHECK ----------------
+def stress_upvotes(store, threads=16, votes=200):
+    """Upvote one fresh idea from many threads at once; returns (expected, actual) upvotes"""
+    idea_id = store.add_idea("stress test idea", "stress", "stress", upvotes=0)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: store.upvote(idea_id), range(threads * votes)))
+    return threads * votes, store.get_idea(idea_id)["upvotes"]
+
+
+if __name__ == "__main__":
+    # python kai_store.py import   -> copy ideas.csv / kudos.csv into an empty kai.db
+    # python kai_store.py stress [threads] [votes per thread]  -> parallel upvotes on a scratch DB
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "stress"
+    if cmd == "import":
+        store = SQLiteStore(ideas_csv="", kudos_csv="")
+        if not store.is_empty():
+            sys.exit(f"❌ {DB_FILE} already has data")
+        print(f"✅ Imported {import_csv(store)} into {DB_FILE}")
+    elif cmd == "stress":
+        threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+        votes = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+        ok = True
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, buffered in (("direct", False), ("buffered", True)):
+                store = SQLiteStore(os.path.join(tmp, f"{name}.db"), ideas_csv="", kudos_csv="")
+                if buffered:
+                    store = BufferedStore(store)
+                start = time.perf_counter()
+                expected, actual = stress_upvotes(store, threads, votes)
+                elapsed = time.perf_counter() - start
+                if buffered:
+                    store.close()
+                    actual = store.store.get_idea(store.store.top_ideas(1)[0]["idea_id"])["upvotes"]
+                ok = ok and expected == actual
+                print(f"{'✅' if expected == actual else '❌'} {name}: {actual}/{expected} upvotes kept "
+                      f"({threads} threads, {expected / elapsed:.0f} upvotes/s)")
+        sys.exit(0 if ok else 1)
+    else:
+        sys.exit(f"Unknown command: {cmd}")
@@ -0,0 +1,104 @@
+# lexical_index.py
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# ---------------- CONFIG ----------------
+K1 = 1.5
+B = 0.75
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "if", "in", "is", "it", "me", "my", "of", "on", "or", "should", "so",
+    "that", "the", "this", "to", "we", "what", "when", "where", "which", "who", "why",
+    "with", "you", "your",
+}
+# ----------------------------------------
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Small BM25 inverted index over the manual sections.
+    Built by data_ingest.py, saved as JSON next to chroma_db, loaded once by arai_rag.
+    """
+
+    def __init__(self, ids, documents, metadatas, postings, doc_len, k1=K1, b=B):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.postings = postings          # term -> [[doc_idx, tf], ...]
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        n = len(ids)
+        self.avgdl = (sum(doc_len) / n) if n else 0.0
+        self.idf = {
+            t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5))
+            for t, p in postings.items()
+        }
+        self.id_index = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, ids, documents, metadatas):
+        postings = defaultdict(list)
+        doc_len = []
+        for i, doc in enumerate(documents):
+            tokens = tokenize(doc)
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append([i, tf])
+        return cls(list(ids), list(documents), list(metadatas), dict(postings), doc_len)
+
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "postings": self.postings,
+                "doc_len": self.doc_len,
+                "k1": self.k1,
+                "b": self.b,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["ids"], data["documents"], data["metadatas"], data["postings"],
+                   data["doc_len"], k1=data.get("k1", K1), b=data.get("b", B))
+
+    def search(self, query, top_k=5, where=None):
+        """
+        Returns [(doc_idx, relevance)] best first, relevance in [0, 1]:
+        the BM25 score relative to a document of average length containing
+        every query term once (capped at 1).
+        where: optional {metadata key: value} filter, like Chroma's.
+        """
+        query_terms = set(tokenize(query))
+        terms = [t for t in query_terms if t in self.postings]
+        if not terms:
+            return []
+        scores = defaultdict(float)
+        for t in terms:
+            idf = self.idf[t]
+            for i, tf in self.postings[t]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[i] / (self.avgdl or 1))
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        # terms the manual never uses count at full idf, so off-topic queries score low
+        unseen_idf = math.log(1 + (len(self.ids) + 0.5) / 0.5)
+        ceiling = sum(self.idf.get(t, unseen_idf) for t in query_terms)
+        if where:
+            scores = {
+                i: sc for i, sc in scores.items()
+                if all((self.metadatas[i] or {}).get(k) == v for k, v in where.items())
+            }
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        return [(i, min(1.0, s / ceiling)) for i, s in ranked]
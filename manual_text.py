@@ -0,0 +1,101 @@
+# manual_text.py
+import re
+
+
+def split_sentences(text):
+    sents = re.split(r'(?<=[\.\!\?])\s+|(?=Step \d+:)', text.strip())
+    return [s.strip() for s in sents if s.strip()]
+
+
+def section_title(section):
+    # first line is the heading; drop its number (1., 5.4, ...)
+    first_line = section.split("\n", 1)[0]
+    return re.sub(r"^\d+(?:\.\d+)*\s+", "", first_line).strip()
+
+
+def prepare_section(text, title):
+    """
+    Query-independent work answer_question needs for one section:
+    - sentences: split, title removed, deduplicated (first sentence if nothing is left)
+    - fallback: section text without its title, used when the LLM output is empty
+    """
+    title = (title or "").strip()
+    all_sents = split_sentences(text)
+    sentences, seen = [], set()
+    for s in all_sents:
+        if s and s != title and s not in seen:
+            sentences.append(s)
+            seen.add(s)
+    if not sentences and all_sents:
+        sentences = [all_sents[0]]
+
+    fallback = text
+    if fallback.startswith(title):
+        fallback = fallback[len(title):].strip()
+
+    return {"title": title, "sentences": sentences, "fallback": fallback.strip()}
+
+
+# ---------------- CHUNKING ----------------
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    # rough stand-in for the embedding tokenizer: words and punctuation marks
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def chunk_section(section, max_tokens=256, overlap=40):
+    """
+    Split one section into sentence-aligned chunks of at most max_tokens,
+    each starting with the last ~overlap tokens of sentences from the previous
+    chunk. Chunks after the first repeat the heading line so they embed with context.
+    Returns a list of chunk texts (a short section is a single chunk).
+    """
+    if count_tokens(section) <= max_tokens:
+        return [section]
+
+    heading = section.split("\n", 1)[0].strip()
+    # every chunk after the first gets the heading prepended: keep room for it
+    limit = max(1, max_tokens - count_tokens(heading))
+    sents = []
+    for s in split_sentences(section):
+        if count_tokens(s) <= limit:
+            sents.append(s)
+            continue
+        # a single over-long sentence is cut into word windows
+        piece, size = [], 0
+        for w in s.split():
+            n = count_tokens(w)
+            if piece and size + n > limit:
+                sents.append(" ".join(piece))
+                piece, size = [], 0
+            piece.append(w)
+            size += n
+        if piece:
+            sents.append(" ".join(piece))
+
+    chunks, current, size = [], [], 0
+    for s in sents:
+        n = count_tokens(s)
+        if current and size + n > limit:
+            chunks.append(current)
+            # carry trailing sentences over as overlap, as long as s still fits after them
+            carry, carried = [], 0
+            for prev in reversed(current):
+                t = count_tokens(prev)
+                if carried + t > overlap or carried + t + n > limit:
+                    break
+                carry.insert(0, prev)
+                carried += t
+            current, size = carry, carried
+        current.append(s)
+        size += n
+    if current:
+        chunks.append(current)
+
+    texts = []
+    for k, chunk in enumerate(chunks):
+        body = " ".join(chunk)
+        texts.append(body if k == 0 or body.startswith(heading) else f"{heading}\n{body}")
+    return texts
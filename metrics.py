@@ -0,0 +1,286 @@
+# metrics.py
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+except ImportError:   # optional: the small implementation below is used instead
+    prometheus_client = None
+
+# ---------------- CONFIG ----------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SCORE_BUCKETS = (0.2, 0.4, 0.6, 0.8, 1.0, 1.2, 1.4, 1.5, 1.6, 1.8, 2.0)   # retrieval distance, lower is better
+# share of answers whose trace is logged (logger "arai", DEBUG level)
+LOG_SAMPLE_RATE = float(os.getenv("ARAI_LOG_SAMPLE_RATE", "0.1"))
+LOG_LEVEL = os.getenv("ARAI_LOG_LEVEL", "")   # e.g. DEBUG to see the sampled traces on stderr
+# ----------------------------------------
+
+logger = logging.getLogger("arai")
+if LOG_LEVEL:
+    logger.setLevel(LOG_LEVEL.upper())
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+
+
+# ---------------- MINIMAL PROMETHEUS ----------------
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels_text(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+class _Metric:
+    """Labelled metric family with the prometheus_client calls used here: labels(), inc(), observe()"""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = [kwargs[n] for n in self.labelnames]
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._child()
+            return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, names, values):
+        return [f"{name}_total{_labels_text(names, values)} {_fmt(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.counts[i] += 1
+                    break
+
+    def render(self, name, names, values):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines, cumulative = [], 0
+        for upper, n in zip(self.buckets, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_labels_text(names, values, ('le', _fmt(float(upper))))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels_text(names, values, ('le', '+Inf'))} {count}")
+        lines.append(f"{name}_sum{_labels_text(names, values)} {_fmt(total)}")
+        lines.append(f"{name}_count{_labels_text(names, values)} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+if prometheus_client is not None:
+    REGISTRY = prometheus_client.CollectorRegistry()
+    Counter = prometheus_client.Counter
+    Histogram = prometheus_client.Histogram
+    CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+    def render():
+        return prometheus_client.generate_latest(REGISTRY)
+else:
+    REGISTRY = Registry()
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def render():
+        return REGISTRY.render()
+
+
+# ---------------- METRICS ----------------
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "API request latency by route",
+    ["method", "route", "status"], registry=REGISTRY, buckets=LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram(
+    "arai_stage_duration_seconds", "Time spent in each answer_question stage",
+    ["stage"], registry=REGISTRY, buckets=LATENCY_BUCKETS)
+TOKENS = Counter(
+    "arai_llm_tokens", "OpenAI chat tokens used", ["kind"], registry=REGISTRY)
+TOP_SCORE = Histogram(
+    "arai_retrieval_top_score", "Distance of the best retrieved section (lower is better)",
+    registry=REGISTRY, buckets=SCORE_BUCKETS)
+# refusal rate = outcome="refused" / all outcomes
+ANSWERS = Counter(
+    "arai_answers", "Answers by outcome (answered, extractive, refused, cached, llm_error, invalid, error, aborted)",
+    ["outcome"], registry=REGISTRY)
+
+
+# ---------------- TRACING ----------------
+_current = contextvars.ContextVar("arai_trace", default=None)
+
+
+class Trace:
+    """
+    Stage timings and fields of one answer. Stages are observed into
+    STAGE_SECONDS as they finish; finish() counts the outcome and logs a
+    sampled JSON line with everything collected.
+    """
+
+    def __init__(self, event, **fields):
+        self.event = event
+        self.fields = fields
+        self.stages = {}
+        self.start = time.perf_counter()
+        self.finished = False
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            STAGE_SECONDS.labels(stage=name).observe(elapsed)
+
+    def finish(self, outcome, count=True, **fields):
+        self.finished = True
+        if count:
+            ANSWERS.labels(outcome=outcome).inc()
+        if _current.get() is self:
+            _current.set(None)
+        self.fields.update(fields)
+        log_sampled(self.event, {
+            "outcome": outcome,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()},
+            **self.fields,
+        })
+
+
+def start_trace(event, **fields):
+    """New Trace, also made current so nested helpers can use stage() / annotate()"""
+    trace = Trace(event, **fields)
+    _current.set(trace)
+    return trace
+
+
+@contextmanager
+def use_trace(trace):
+    """Make trace the current one inside the block (e.g. one question of a batch)"""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def stage(name):
+    """Time a stage of the current trace (or just observe it when there is none)"""
+    trace = _current.get()
+    if trace is None:
+        trace = Trace(None)
+    return trace.stage(name)
+
+
+def annotate(**fields):
+    trace = _current.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def record_usage(usage):
+    """Token counts from an OpenAI response (missing usage is ignored)"""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", 0) or 0
+    completion = getattr(usage, "completion_tokens", 0) or 0
+    TOKENS.labels(kind="prompt").inc(prompt)
+    TOKENS.labels(kind="completion").inc(completion)
+    annotate(prompt_tokens=prompt, completion_tokens=completion)
+
+
+def log_sampled(event, fields, rate=LOG_SAMPLE_RATE):
+    """One JSON debug line for roughly rate of the calls"""
+    if not logger.isEnabledFor(logging.DEBUG) or random.random() >= rate:
+        return
+    logger.debug(json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
@@ -0,0 +1,141 @@
+# runtime.py
+import importlib
+import os
+import threading
+import time
+
+# ---------------- CONFIG ----------------
+# subsystems to load in a background thread at startup ("all", "" or a comma list)
+WARMUP = os.getenv("WARMUP", "all")
+# subsystems that must be ready before /readyz reports ready
+READY_REQUIRED = os.getenv("READY_REQUIRED", "scheduler,jai,kai")
+# ----------------------------------------
+
+PROCESS_START = time.time()
+
+
+class Subsystem:
+    """
+    A group of modules imported on first use; the first one is the main module.
+    If init is given, main_module.init() is called after import (e.g. arai_rag
+    opening Chroma); close ("module.function") runs at shutdown if loaded.
+    Tracks state, error and import/init timings.
+    """
+
+    def __init__(self, name, modules, init=None, close=None):
+        self.name = name
+        self.modules = modules
+        self.init = init
+        self.close = close
+        self.state = "idle"       # idle -> loading -> ready | failed
+        self.error = None
+        self.timings = {}
+        self._loaded = None       # module name -> module, once ready
+        self._lock = threading.Lock()
+
+    def get(self, module_name=None):
+        if self._loaded is None:
+            self._load()
+        return self._loaded[module_name or self.modules[0]]
+
+    def _load(self):
+        with self._lock:
+            if self._loaded is not None:
+                return
+            self.state, self.error = "loading", None
+            try:
+                loaded = {}
+                for mod_name in self.modules:
+                    start = time.perf_counter()
+                    loaded[mod_name] = importlib.import_module(mod_name)
+                    self.timings[f"import {mod_name}"] = round(time.perf_counter() - start, 4)
+                if self.init:
+                    start = time.perf_counter()
+                    getattr(loaded[self.modules[0]], self.init)()
+                    self.timings[f"{self.modules[0]}.{self.init}()"] = round(time.perf_counter() - start, 4)
+            except Exception as e:
+                self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+                raise
+            self._loaded = loaded
+            self.state = "ready"
+
+    def shutdown(self):
+        if self._loaded is None or not self.close:
+            return
+        mod_name, func = self.close.rsplit(".", 1)
+        getattr(self._loaded[mod_name], func)()
+
+    def status(self):
+        return {"state": self.state, "error": self.error, "timings": self.timings}
+
+
+SUBSYSTEMS = {
+    "scheduler": Subsystem("scheduler", ["scheduler", "schedule_store", "schedule_upload", "schedule_format"]),
+    "arai": Subsystem("arai", ["arai_rag"], init="init"),
+    "jai": Subsystem("jai", ["jai_agent"]),
+    "kai": Subsystem("kai", ["kai_agent", "kai_store"], close="kai_store.close"),
+}
+
+# startup phases recorded by the API module (e.g. "import api")
+startup_timings = {}
+
+
+def get(name, module_name=None):
+    """Main (or named) module of a subsystem, loading it on first use (raises if loading fails)"""
+    return SUBSYSTEMS[name].get(module_name)
+
+
+def _names(spec):
+    if spec.strip() == "all":
+        return list(SUBSYSTEMS)
+    return [n.strip() for n in spec.split(",") if n.strip() in SUBSYSTEMS]
+
+
+def warm_up(names=None, background=True):
+    names = _names(WARMUP) if names is None else names
+
+    def run():
+        start = time.perf_counter()
+        for name in names:
+            try:
+                get(name)
+            except Exception:
+                pass   # state/error are kept on the subsystem
+        startup_timings["warm-up"] = round(time.perf_counter() - start, 4)
+
+    if not names:
+        return None
+    if not background:
+        run()
+        return None
+    t = threading.Thread(target=run, name="warm-up", daemon=True)
+    t.start()
+    return t
+
+
+def shutdown():
+    """Run the close hooks of loaded subsystems (e.g. flush buffered Kai upvotes)"""
+    for s in SUBSYSTEMS.values():
+        try:
+            s.shutdown()
+        except Exception as e:
+            print(f"⚠️ {s.name} shutdown failed: {e}")
+
+
+def status():
+    return {name: s.status() for name, s in SUBSYSTEMS.items()}
+
+
+def readiness():
+    required = _names(READY_REQUIRED)
+    ready = all(SUBSYSTEMS[n].state == "ready" for n in required)
+    return ready, required
+
+
+def startup_report():
+    return {
+        "process_start": PROCESS_START,
+        "uptime": round(time.time() - PROCESS_START, 3),
+        "phases": startup_timings,
+        "subsystems": {name: s.timings for name, s in SUBSYSTEMS.items()},
+    }
@@ -0,0 +1,105 @@
+# schedule_format.py
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:   # optional: faster JSON encoding
+    orjson = None
+
+# ---------------- CONFIG ----------------
+FORMATS = ("dict", "compact", "bitset", "arrow")
+DEFAULT_FORMAT = "dict"     # schedule.to_dict(), what existing clients expect
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+# ----------------------------------------
+
+
+# ---------------- ENCODE ----------------
+def to_compact(schedule):
+    """{"employees", "shifts", "assigned": per employee, the indices of its shifts}"""
+    m = schedule.to_numpy() == 1
+    return {
+        "format": "compact",
+        "employees": schedule.index.tolist(),
+        "shifts": schedule.columns.tolist(),
+        "assigned": [np.flatnonzero(row).tolist() for row in m],
+    }
+
+
+def to_bitset(schedule):
+    """
+    {"employees", "shifts", "bits"}: the employees x shifts 0/1 matrix, row-major,
+    packed 8 cells per byte (most significant bit first), base64-encoded.
+    """
+    m = schedule.to_numpy() == 1
+    return {
+        "format": "bitset",
+        "employees": schedule.index.tolist(),
+        "shifts": schedule.columns.tolist(),
+        "bits": base64.b64encode(np.packbits(m, axis=None).tobytes()).decode("ascii"),
+    }
+
+
+def encode_schedule(schedule, fmt=DEFAULT_FORMAT):
+    if fmt == "dict":
+        return schedule.to_dict()
+    if fmt == "compact":
+        return to_compact(schedule)
+    if fmt == "bitset":
+        return to_bitset(schedule)
+    raise ValueError(f"Unknown schedule format: {fmt} (use one of {', '.join(FORMATS)})")
+
+
+# ---------------- DECODE ----------------
+def decode_schedule(data):
+    """Inverse of encode_schedule: accepts any JSON format and returns the DataFrame"""
+    fmt = data.get("format") if isinstance(data, dict) else None
+    if fmt not in ("compact", "bitset"):
+        return pd.DataFrame(data)
+    employees, shifts = data["employees"], data["shifts"]
+    m = np.zeros((len(employees), len(shifts)), dtype=int)
+    if fmt == "compact":
+        for i, cols in enumerate(data["assigned"]):
+            m[i, cols] = 1
+    else:
+        bits = np.frombuffer(base64.b64decode(data["bits"]), dtype=np.uint8)
+        m[:] = np.unpackbits(bits, count=m.size).reshape(m.shape)
+    return pd.DataFrame(m, index=employees, columns=shifts)
+
+
+# ---------------- SERIALIZE ----------------
+def _default(o):
+    if isinstance(o, (np.generic, np.ndarray)):
+        return o.tolist()
+    return str(o)
+
+
+def dumps(obj):
+    """JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def to_arrow(schedule, metadata=None):
+    """
+    Arrow IPC stream: an Employee column plus one uint8 column per shift.
+    metadata (e.g. schedule_id, stats) is stored as JSON in the schema metadata.
+    Raises ImportError when pyarrow is not installed.
+    """
+    import pyarrow as pa
+
+    m = schedule.to_numpy(dtype=np.uint8)
+    columns = [pa.array(schedule.index.astype(str).tolist())]
+    columns += [pa.array(m[:, j]) for j in range(m.shape[1])]
+    names = ["Employee"] + [str(s) for s in schedule.columns]
+    table = pa.Table.from_arrays(columns, names=names)
+    if metadata:
+        table = table.replace_schema_metadata({"meta": json.dumps(metadata, default=str)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
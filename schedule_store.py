@@ -0,0 +1,110 @@
+# schedule_store.py
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from scheduler import availability_matrix, swap_cells
+
+# ---------------- CONFIG ----------------
+STORE_MAX_SCHEDULES = int(os.getenv("SCHEDULE_STORE_SIZE", "256"))
+STORE_TTL_SECONDS = float(os.getenv("SCHEDULE_STORE_TTL", "3600"))
+# ----------------------------------------
+
+
+class LRUTTLCache:
+    """Thread-safe dict with a max size (least recently used goes first) and a TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            # touching an entry refreshes both its LRU position and its TTL
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            return value
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return None if item is None else item[1]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ScheduleSession:
+    """A generated schedule plus the availability it was built from, kept as matrices"""
+
+    def __init__(self, avail_df, schedule_df):
+        self.employees, self.shifts, self.avail, self.max_hours = availability_matrix(avail_df)
+        self.emp_index = {e: i for i, e in enumerate(self.employees)}
+        self.shift_index = {s: j for j, s in enumerate(self.shifts)}
+        self.original = schedule_df.loc[self.employees, self.shifts].to_numpy(dtype=np.int8)
+        self.current = self.original.copy()
+        self.lock = threading.Lock()
+
+    def _cell(self, i, j):
+        return {"employee": self.employees[i], "shift": self.shifts[j], "value": int(self.current[i, j])}
+
+    def to_frame(self):
+        return pd.DataFrame(self.current.astype(int), index=self.employees, columns=self.shifts)
+
+    def swap(self, emp1, emp2, shift):
+        """Returns (success, changed cells)"""
+        i1, i2 = self.emp_index.get(emp1), self.emp_index.get(emp2)
+        j = self.shift_index.get(shift)
+        if i1 is None or i2 is None or j is None:
+            return False, []
+        with self.lock:
+            if not swap_cells(self.current, self.avail, i1, i2, j):
+                return False, []
+            return True, [self._cell(i1, j), self._cell(i2, j)]
+
+    def reset(self):
+        """Back to the generated schedule; returns the cells that changed"""
+        with self.lock:
+            rows, cols = np.nonzero(self.current != self.original)
+            self.current = self.original.copy()
+            return [self._cell(i, j) for i, j in zip(rows, cols)]
+
+
+class ScheduleStore:
+    def __init__(self, max_size=STORE_MAX_SCHEDULES, ttl=STORE_TTL_SECONDS):
+        self._cache = LRUTTLCache(max_size, ttl)
+
+    def create(self, avail_df, schedule_df):
+        schedule_id = uuid.uuid4().hex
+        self._cache.put(schedule_id, ScheduleSession(avail_df, schedule_df))
+        return schedule_id
+
+    def get(self, schedule_id):
+        return self._cache.get(schedule_id)
+
+    def delete(self, schedule_id):
+        return self._cache.pop(schedule_id) is not None
+
+
+store = ScheduleStore()
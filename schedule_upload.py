@@ -0,0 +1,242 @@
+# schedule_upload.py
+import csv
+import io
+import os
+import uuid
+
+import pandas as pd
+
+from schedule_store import LRUTTLCache
+
+# ---------------- CONFIG ----------------
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(5 * 1024 * 1024)))
+MULTIPART_SLACK = 64 * 1024    # boundaries / part headers around the file in a /preview request body
+UPLOAD_MAX_ROWS = int(os.getenv("UPLOAD_MAX_ROWS", "5000"))    # employees per upload
+PREVIEW_ROWS = int(os.getenv("PREVIEW_ROWS", "50"))            # rows echoed back by /preview
+CHUNK_ROWS = 1000                                              # CSV rows parsed per chunk
+MAX_ERRORS = 20                                                # validation errors reported
+TOKEN_CACHE_SIZE = int(os.getenv("AVAILABILITY_CACHE_SIZE", "128"))
+TOKEN_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL", "1800"))
+REQUIRED_COLUMNS = ["Employee", "MaxHoursPerWeek"]
+# ----------------------------------------
+
+
+class UploadError(ValueError):
+    """Bad upload (schema / values); errors holds per-row messages"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class UploadTooLarge(UploadError):
+    pass
+
+
+class LimitedReader(io.RawIOBase):
+    """File wrapper that fails as soon as more than max_bytes have been read"""
+
+    def __init__(self, raw, max_bytes):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.read_bytes = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        self.read_bytes += len(data)
+        if self.read_bytes > self.max_bytes:
+            raise UploadTooLarge(f"File is larger than {self.max_bytes} bytes")
+        buffer[:len(data)] = data
+        return len(data)
+
+
+# ---------------- VALIDATION ----------------
+def normalize_columns(columns):
+    """Strip BOM / spaces and put Employee, MaxHoursPerWeek first (the solver relies on it)"""
+    columns = [str(c).replace("\ufeff", "").strip() for c in columns]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise UploadError(f"Missing column(s): {', '.join(missing)}")
+    dupes = sorted({c for c in columns if columns.count(c) > 1})
+    if dupes:
+        raise UploadError(f"Duplicate column(s): {', '.join(dupes)}")
+    shifts = [c for c in columns if c not in REQUIRED_COLUMNS]
+    if not shifts:
+        raise UploadError("No shift columns after Employee / MaxHoursPerWeek")
+    return columns, REQUIRED_COLUMNS + shifts
+
+
+def validate_chunk(chunk, first_row, seen, errors):
+    """
+    Check one parsed chunk in place: Employee present and unique, MaxHoursPerWeek
+    a non-negative whole number, shift cells 0/1 (blank = 0, anything else is an error).
+    Appends "row N: ..." messages to errors and returns the cleaned chunk.
+    """
+    shifts = chunk.columns[2:]
+    rows = range(first_row, first_row + len(chunk))
+
+    employees = chunk["Employee"].astype("string").str.strip()
+    hours = pd.to_numeric(chunk["MaxHoursPerWeek"], errors="coerce")
+    raw = chunk[shifts]
+    cells = raw.apply(pd.to_numeric, errors="coerce")
+    # only a blank cell means 0: "yes" / "abc" are errors, not "unavailable"
+    blank = raw.apply(lambda c: c.isna() | (c.astype("string").str.strip() == "")).astype(bool)
+
+    bad_emp = employees.isna() | (employees == "")
+    bad_hours = hours.isna() | (hours < 0) | (hours % 1 != 0)
+    bad_cells = (cells.isna() & ~blank) | (cells.notna() & ~cells.isin([0, 1]))
+    cells = cells.fillna(0)
+    for n, (row, emp) in enumerate(zip(rows, employees)):
+        if len(errors) >= MAX_ERRORS:
+            break
+        if bad_emp.iloc[n]:
+            errors.append(f"row {row}: missing Employee")
+        elif emp in seen:
+            errors.append(f"row {row}: duplicate Employee '{emp}'")
+        else:
+            seen.add(emp)
+        if bad_hours.iloc[n]:
+            errors.append(f"row {row}: MaxHoursPerWeek must be a whole number >= 0")
+        if bad_cells.iloc[n].any():
+            cols = [s for s, bad in zip(shifts, bad_cells.iloc[n]) if bad]
+            errors.append(f"row {row}: shift values must be 0 or 1 ({', '.join(cols)})")
+
+    out = pd.DataFrame({"Employee": employees, "MaxHoursPerWeek": hours.fillna(0).astype(int)})
+    return pd.concat([out, cells.astype(int)], axis=1)
+
+
+# ---------------- PARSING ----------------
+def _finish(chunks, errors):
+    if errors:
+        raise UploadError("Invalid availability file", errors)
+    if not chunks:
+        raise UploadError("File has no employee rows")
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _row_chunks(rows, width, errors):
+    """
+    Data rows of a csv.reader as DataFrames of CHUNK_ROWS text rows. Blank lines
+    are skipped, short rows padded; a row with more fields than the header is
+    reported (and cut to the header, so the row numbers of later errors still hold).
+    """
+    batch, n = [], 0
+    for row in rows:
+        if not row:
+            continue
+        n += 1
+        if len(row) > width:
+            if len(errors) < MAX_ERRORS:
+                errors.append(f"row {n}: {len(row)} fields, the header has {width}")
+            row = row[:width]
+        batch.append(row + [""] * (width - len(row)))
+        if len(batch) == CHUNK_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_csv(raw, max_bytes=UPLOAD_MAX_BYTES, max_rows=UPLOAD_MAX_ROWS):
+    """
+    Parse an availability CSV from a binary file object in CHUNK_ROWS pieces,
+    validating as it goes. Stops reading as soon as a size or row limit is hit.
+    Blocking: run it in a worker thread.
+    """
+    reader = io.BufferedReader(LimitedReader(raw, max_bytes))
+    text = io.TextIOWrapper(reader, encoding="utf-8-sig", newline="")
+    chunks, errors, seen, total = [], [], set(), 0
+    try:
+        # read with the csv module: pandas would silently rename a second "Mon" to "Mon.1"
+        # and drop the extra fields of a too long row with only a warning
+        rows = csv.reader(text)
+        header = next((row for row in rows if row), None)
+        if header is None:
+            raise UploadError("File is empty")
+        columns, ordered = normalize_columns(header)
+        for batch in _row_chunks(rows, len(columns), errors):
+            if total + len(batch) > max_rows:
+                raise UploadTooLarge(f"More than {max_rows} rows")
+            chunk = pd.DataFrame(batch, columns=columns)[ordered]
+            chunks.append(validate_chunk(chunk, total + 1, seen, errors))
+            total += len(batch)
+    except csv.Error as e:
+        raise UploadError(f"Could not parse CSV: {e}")
+    except UnicodeDecodeError:
+        raise UploadError("File is not UTF-8 text (for Excel files use .xls / .xlsx)")
+    return _finish(chunks, errors)
+
+
+def parse_excel(raw, max_bytes=UPLOAD_MAX_BYTES, max_rows=UPLOAD_MAX_ROWS):
+    """Legacy schedule.xls / .xlsx: read whole (capped by size and rows), then validate"""
+    data = LimitedReader(raw, max_bytes).read()
+    try:
+        # header row kept as data: read_excel would rename duplicate columns like read_csv
+        df = pd.read_excel(io.BytesIO(data), header=None, nrows=max_rows + 2)
+    except ImportError as e:
+        # .xls needs xlrd, .xlsx needs openpyxl
+        raise UploadError(f"Excel support is not installed on the server: {e}")
+    except ValueError as e:
+        raise UploadError(f"Could not read Excel file: {e}")
+    if df.empty:
+        raise UploadError("File is empty")
+    columns, ordered = normalize_columns(["" if pd.isna(c) else c for c in df.iloc[0]])
+    df = df.iloc[1:].reset_index(drop=True)
+    if len(df) > max_rows:
+        raise UploadTooLarge(f"More than {max_rows} rows")
+    df.columns = columns
+    df = df.dropna(how="all")[ordered]
+    errors = []
+    return _finish([validate_chunk(df, 1, set(), errors)], errors)
+
+
+def parse_upload(raw, filename="", max_bytes=UPLOAD_MAX_BYTES, max_rows=UPLOAD_MAX_ROWS):
+    if (filename or "").lower().endswith((".xls", ".xlsx")):
+        return parse_excel(raw, max_bytes, max_rows)
+    return parse_csv(raw, max_bytes, max_rows)
+
+
+def availability_stats(df):
+    shifts = df.columns[2:].tolist()
+    per_shift = df[shifts].sum()
+    return {
+        "employees": len(df),
+        "shifts": shifts,
+        "total_max_hours": int(df["MaxHoursPerWeek"].sum()),
+        "available_slots": int(per_shift.sum()),
+        "available_per_shift": {s: int(n) for s, n in per_shift.items()},
+        "uncoverable_shifts": [s for s, n in per_shift.items() if n == 0],
+    }
+
+
+# ---------------- TOKENS ----------------
+class AvailabilityCache:
+    """Parsed uploads kept under a token so /generate_schedule can reuse them"""
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_TTL_SECONDS):
+        self._cache = LRUTTLCache(max_size, ttl)
+
+    def put(self, df):
+        token = uuid.uuid4().hex
+        self._cache.put(token, df)
+        return token
+
+    def get(self, token):
+        df = self._cache.get(token)
+        return None if df is None else df.copy()
+
+
+uploads = AvailabilityCache()
+
+
+def preview(df, rows=PREVIEW_ROWS):
+    """Upload result for the client: token, first rows, stats"""
+    return {
+        "token": uploads.put(df),
+        "preview": df.head(rows).to_dict(orient="records"),
+        "truncated": len(df) > rows,
+        "stats": availability_stats(df),
+    }
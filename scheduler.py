@@ -1,8 +1,158 @@
 #schedule.py
+import os
+import numpy as np
 import pandas as pd
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
-def solve_schedule(avail_df):
+# ---------------- CONFIG ----------------
+DEFAULT_ENGINE = "numpy"   # "numpy" (vectorized) or "pandas" (original loop)
+MODES = ("greedy", "optimal")   # optimal = min-cost flow
+DEFAULT_MODE = "greedy"
+DEFAULT_TIME_BUDGET = 2.0  # seconds the optimal solver may spend before falling back
+SCHEDULE_WORKERS = int(os.getenv("SCHEDULE_WORKERS", str(os.cpu_count() or 1)))  # batch process pool size
+# ----------------------------------------
+
+
+# ---------------- MATRIX HELPERS ----------------
+def availability_matrix(avail_df):
+    """
+    Turn the availability table into dense arrays:
+    employees (list), shifts (list), avail (employees x shifts, int8), max_hours (int array)
+    """
+    employees = avail_df['Employee'].tolist()
+    shifts = avail_df.columns[2:].tolist()  # skip Employee & MaxHoursPerWeek
+    avail = (avail_df[shifts].to_numpy() == 1).astype(np.int8)
+    max_hours = avail_df['MaxHoursPerWeek'].to_numpy(dtype=np.int64)
+    return employees, shifts, avail, max_hours
+
+
+def greedy_assign(avail, max_hours, seed=None):
+    """
+    Same greedy as the original solve_schedule, on arrays:
+    walk shifts in order, give each one to the available employee with the
+    fewest hours so far (ties broken by a seeded random order).
+    Returns the assignment matrix (employees x shifts, int8).
+    """
+    n_emp, n_shift = avail.shape
+    assigned = np.zeros((n_emp, n_shift), dtype=np.int8)
+    hours = np.zeros(n_emp, dtype=np.int64)
+
+    # random priority replaces random.shuffle(employees): argmin picks the
+    # first minimum, so permuting rows once gives the same tie-break behaviour
+    order = np.random.default_rng(seed).permutation(n_emp)
+    avail_p = avail[order].astype(bool)
+    max_p = max_hours[order]
+
+    for s in range(n_shift):
+        candidates = avail_p[:, s] & (hours < max_p)
+        if not candidates.any():
+            continue
+        # pick the candidate with fewest assigned hours so far
+        chosen = np.argmin(np.where(candidates, hours, np.iinfo(np.int64).max))
+        assigned[order[chosen], s] = 1
+        hours[chosen] += 1
+
+    return assigned
+
+
+def _augment(can, owner, hours, max_hours, rank):
+    """
+    One successive-shortest-path step of the min-cost flow
+        source -> employee (k-th hour costs k) -> shift -> sink
+    Employee->shift arcs cost 0, so the cheapest augmenting path is the
+    alternating path to an unfilled shift that starts at the employee with the
+    fewest hours. Returns False when no shift can be added (max coverage).
+    """
+    n_emp, n_shift = can.shape
+    emp_seen = np.zeros(n_emp, dtype=bool)
+    shift_seen = np.zeros(n_shift, dtype=bool)
+    parent_emp = np.full(n_shift, -1)    # shift reached from this employee
+    parent_shift = np.full(n_emp, -1)    # employee reached by giving up this shift
+
+    spare = np.flatnonzero(hours < max_hours)
+    # group start employees by cost (hours), tie-break by seeded rank
+    spare = spare[np.lexsort((rank[spare], hours[spare]))]
+    for h in np.unique(hours[spare]):
+        frontier = spare[hours[spare] == h]
+        frontier = frontier[~emp_seen[frontier]]
+        emp_seen[frontier] = True
+        while frontier.size:
+            reach = can[frontier]
+            new_shifts = np.flatnonzero(reach.any(axis=0) & ~shift_seen)
+            if not new_shifts.size:
+                break
+            shift_seen[new_shifts] = True
+            parent_emp[new_shifts] = frontier[reach[:, new_shifts].argmax(axis=0)]
+
+            free = new_shifts[owner[new_shifts] < 0]
+            if free.size:
+                s = free[0]
+                # flip the alternating path back to its start employee
+                while s >= 0:
+                    e = parent_emp[s]
+                    prev = parent_shift[e]
+                    owner[s] = e
+                    can[e, s] = False
+                    if prev >= 0:
+                        can[e, prev] = True
+                    s = prev
+                hours[e] += 1
+                return True
+
+            nxt = owner[new_shifts]
+            keep = ~emp_seen[nxt]
+            nxt, via = nxt[keep], new_shifts[keep]
+            emp_seen[nxt] = True
+            parent_shift[nxt] = via
+            frontier = nxt
+    return False
+
+
+def optimal_assign(avail, max_hours, time_budget=DEFAULT_TIME_BUDGET, seed=None):
+    """
+    Min-cost-flow assignment: covers as many shifts as possible and, among
+    those, minimises the sum of squared hours (i.e. balances load).
+    Returns the assignment matrix, or None if time_budget ran out first.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    n_emp, n_shift = avail.shape
+    can = avail.astype(bool)                    # residual employee -> shift arcs
+    owner = np.full(n_shift, -1)                # residual shift -> employee arcs
+    hours = np.zeros(n_emp, dtype=np.int64)
+    rank = np.random.default_rng(seed).permutation(n_emp)
+
+    while _augment(can, owner, hours, max_hours, rank):
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+
+    assigned = np.zeros((n_emp, n_shift), dtype=np.int8)
+    filled = np.flatnonzero(owner >= 0)
+    assigned[owner[filled], filled] = 1
+    return assigned
+
+
+def schedule_stats(assigned, shifts):
+    """Coverage and hour-spread numbers for an assignment matrix"""
+    filled = assigned.sum(axis=0) > 0
+    hours = assigned.sum(axis=1)
+    return {
+        "total_shifts": len(shifts),
+        "filled_shifts": int(filled.sum()),
+        "coverage": round(float(filled.mean()), 4) if len(shifts) else 1.0,
+        "unfilled": [s for s, f in zip(shifts, filled) if not f],
+        "hours_min": int(hours.min()) if hours.size else 0,
+        "hours_max": int(hours.max()) if hours.size else 0,
+        "hours_mean": round(float(hours.mean()), 2) if hours.size else 0.0,
+        "hours_std": round(float(hours.std()), 2) if hours.size else 0.0,
+        "hours_spread": int(hours.max() - hours.min()) if hours.size else 0,
+    }
+
+
+# ---------------- SOLVERS ----------------
+def _solve_schedule_pandas(avail_df):
     employees = avail_df['Employee'].tolist()
     shifts = avail_df.columns[2:].tolist()  # skip Employee & MaxHoursPerWeek
     max_hours = dict(zip(employees, avail_df['MaxHoursPerWeek']))
@@ -16,7 +166,7 @@ def solve_schedule(avail_df):
     # Assign shifts
     for s in shifts:
         # Find available employees who haven't reached max_hours
-        candidates = [e for e in employees 
+        candidates = [e for e in employees
                       if avail_df.loc[avail_df['Employee']==e, s].values[0] == 1
                       and schedule.loc[e].sum() < max_hours[e]]
         if candidates:
@@ -27,6 +177,108 @@ def solve_schedule(avail_df):
     return schedule
 
 
+def solve_schedule_detailed(avail_df, mode=DEFAULT_MODE, time_budget=DEFAULT_TIME_BUDGET,
+                            engine=DEFAULT_ENGINE, seed=None):
+    """
+    Returns (schedule DataFrame, stats dict).
+    mode="optimal" runs the min-cost-flow solver within time_budget seconds and
+    falls back to the greedy result if it does not finish in time.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown schedule mode: {mode}")
+    start = time.perf_counter()
+
+    if mode == "greedy" and engine == "pandas":
+        schedule = _solve_schedule_pandas(avail_df)
+        stats = schedule_stats(schedule.to_numpy(), schedule.columns.tolist())
+        stats.update(solver="greedy", elapsed=round(time.perf_counter() - start, 4))
+        return schedule, stats
+    if engine not in ("numpy", "pandas"):
+        raise ValueError(f"Unknown schedule engine: {engine}")
+
+    employees, shifts, avail, max_hours = availability_matrix(avail_df)
+    solver = "greedy"
+    assigned = None
+    if mode == "optimal":
+        assigned = optimal_assign(avail, max_hours, time_budget=time_budget, seed=seed)
+        solver = "optimal" if assigned is not None else "greedy_fallback"
+    if assigned is None:
+        assigned = greedy_assign(avail, max_hours, seed=seed)
+
+    stats = schedule_stats(assigned, shifts)
+    stats.update(solver=solver, elapsed=round(time.perf_counter() - start, 4))
+    schedule = pd.DataFrame(assigned.astype(int), index=employees, columns=shifts)
+    return schedule, stats
+
+
+def solve_schedule(avail_df, engine=DEFAULT_ENGINE, seed=None, mode=DEFAULT_MODE,
+                   time_budget=DEFAULT_TIME_BUDGET):
+    schedule, _ = solve_schedule_detailed(avail_df, mode=mode, time_budget=time_budget,
+                                          engine=engine, seed=seed)
+    return schedule
+
+
+# ---------------- BATCH (many branches) ----------------
+def _solve_branch(branch_id, availability, mode, time_budget, seed):
+    # runs in a worker process; must stay top-level so it can be pickled
+    avail_df = pd.DataFrame(availability)
+    schedule, stats = solve_schedule_detailed(avail_df, mode=mode, time_budget=time_budget, seed=seed)
+    return {"branch_id": branch_id, "availability": avail_df, "schedule": schedule, "stats": stats}
+
+
+def solve_branches(branches, max_workers=SCHEDULE_WORKERS, mode=DEFAULT_MODE,
+                   time_budget=DEFAULT_TIME_BUDGET, seed=None):
+    """
+    Solve many branches in parallel on a process pool.
+    branches: list of {"branch_id": ..., "availability": {...}}
+    Yields one result dict per branch as soon as it finishes; a failing branch
+    yields {"branch_id": ..., "error": "..."} instead of stopping the batch.
+    """
+    max_workers = max(1, min(max_workers, SCHEDULE_WORKERS, len(branches) or 1))
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {}
+        for i, b in enumerate(branches):
+            branch_id = b.get("branch_id", i) if isinstance(b, dict) else i
+            if not isinstance(b, dict) or "availability" not in b:
+                yield {"branch_id": branch_id, "error": "Missing availability"}
+                continue
+            fut = pool.submit(_solve_branch, branch_id, b["availability"],
+                              b.get("mode", mode), b.get("time_budget", time_budget), seed)
+            futures[fut] = branch_id
+
+        done = set()
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except BrokenProcessPool as e:
+                # a worker died (OOM kill, segfault): every pending branch fails the same way,
+                # so report it once for all of them instead of once per branch
+                yield {"branch_ids": [b for f, b in futures.items() if f not in done],
+                       "error": f"Worker pool crashed: {e}"}
+                return
+            except Exception as e:
+                res = {"branch_id": futures[fut], "error": f"{type(e).__name__}: {e}"}
+            done.add(fut)
+            yield res
+    finally:
+        # also runs when the consumer stops early (client disconnect): drop queued branches
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def swap_cells(assigned, avail, i1, i2, s):
+    """
+    Same rule as swap_shift, on matrices (row/column indices):
+    one of the two has the shift, and both are available for it.
+    Swaps in place and returns True if allowed.
+    """
+    v1, v2 = assigned[i1, s], assigned[i2, s]
+    if v1 != v2 and avail[i1, s] == 1 and avail[i2, s] == 1:
+        assigned[i1, s], assigned[i2, s] = v2, v1
+        return True
+    return False
+
+
 def swap_shift(schedule, emp1, emp2, shift, availability):
     """
     Swap logic:
@@ -45,4 +297,3 @@ def swap_shift(schedule, emp1, emp2, shift, availability):
         schedule.loc[emp1, shift], schedule.loc[emp2, shift] = v2, v1
         return True, schedule
     return False, schedule
-
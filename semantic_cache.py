@@ -0,0 +1,119 @@
+# semantic_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding (+ a style key).
+    A lookup hits when a cached query of the same style has cosine similarity
+    >= threshold. Bounded size with LRU eviction and a TTL per entry.
+    If stamp_path is given, the cache empties itself whenever that file's
+    mtime changes (data_ingest.py touches it after rebuilding the collection).
+    """
+
+    def __init__(self, threshold=0.95, max_size=512, ttl=3600, stamp_path=None, on_invalidate=None):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+        self.on_invalidate = on_invalidate
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()   # id -> (style_key, unit vector, value, expires_at)
+        self._next_id = 0
+        self._matrix = {}               # style_key -> (ids, stacked vectors), rebuilt lazily
+        self._stamp = self._read_stamp()
+        self._lock = threading.Lock()
+
+    # ---------------- internals ----------------
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._clear()
+            self.invalidations += 1
+            if self.on_invalidate:
+                self.on_invalidate()
+
+    def _clear(self):
+        self._entries.clear()
+        self._matrix.clear()
+
+    def _evict_expired(self, now):
+        expired = [k for k, (_, _, _, exp) in self._entries.items() if exp < now]
+        for k in expired:
+            del self._entries[k]
+        if expired:
+            self._matrix.clear()
+
+    def _vectors(self, style_key):
+        if style_key not in self._matrix:
+            ids = [k for k, (sk, _, _, _) in self._entries.items() if sk == style_key]
+            vecs = np.stack([self._entries[k][1] for k in ids]) if ids else None
+            self._matrix[style_key] = (ids, vecs)
+        return self._matrix[style_key]
+
+    @staticmethod
+    def _unit(embedding):
+        v = np.asarray(embedding, dtype=np.float32)
+        n = np.linalg.norm(v)
+        return v / n if n else v
+
+    # ---------------- API ----------------
+    def lookup(self, embedding, style_key):
+        """Returns the cached value or None"""
+        with self._lock:
+            self._check_stamp()
+            self._evict_expired(time.monotonic())
+            ids, vecs = self._vectors(style_key)
+            if vecs is not None:
+                sims = vecs @ self._unit(embedding)
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = ids[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][2]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, style_key, value):
+        with self._lock:
+            self._check_stamp()
+            key = self._next_id
+            self._next_id += 1
+            self._entries[key] = (style_key, self._unit(embedding), value, time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "invalidations": self.invalidations,
+        }
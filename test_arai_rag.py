@@ -0,0 +1,60 @@
+# test_arai_rag.py
+from arai_rag import extractive_answer, prepare_answer
+from manual_text import section_title
+
+# sections as data_ingest extracts them from FAN_Manual.pdf (the next heading is glued to 5.4)
+REFUND_POLICY = (
+    "5.4 Refund Policy\n"
+    "• Merchandise (mugs, coffee bags): 14-day return with valid receipt.\n"
+    "• Food/drinks: Remake or replace with item of equal value if unsatisfied.\n"
+    "• Manager Approval: Any cash refund > $50 requires manager authorization in POS.\n"
+    "6. Equipment Maintenance"
+)
+COFFEE_GRINDERS = (
+    "6.2 Coffee Grinders\n"
+    "Daily:\n"
+    "• Brush dispensing chute to remove old grounds.\n"
+    "Weekly:\n"
+    "• Empty hopper, clean thoroughly with damp cloth.\n"
+    "• Vacuum grind chamber."
+)
+AVOCADO_TOAST = (
+    "4.1 Avocado Toast\n"
+    "•\n"
+    "Step 1: Toast one thick slice of sourdough bread until golden brown.\n"
+    "Step 2: Spread the mashed avocado evenly over the hot toast."
+)
+
+
+def answer(section, style):
+    hit = {"id": "test", "text": section, "meta": {"title": section_title(section)}, "score": 0.2, "distance": 0.2}
+    return extractive_answer(prepare_answer("question", [hit], style=style), style)
+
+
+def test_bullets_stop_at_next_section():
+    assert answer(REFUND_POLICY, "bullet").split("\n") == [
+        "• Merchandise (mugs, coffee bags): 14-day return with valid receipt.",
+        "• Food/drinks: Remake or replace with item of equal value if unsatisfied.",
+        "• Manager Approval: Any cash refund > $50 requires manager authorization in POS.",
+    ]
+
+
+def test_sentences_stop_at_next_section():
+    out = answer(REFUND_POLICY, "sentence")
+    assert "Equipment" not in out and "Refund Policy" not in out
+    assert out.endswith("manager authorization in POS.")
+
+
+def test_bullets_keep_daily_weekly_labels():
+    assert answer(COFFEE_GRINDERS, "bullet").split("\n") == [
+        "• Daily: Brush dispensing chute to remove old grounds.",
+        "• Weekly: Empty hopper, clean thoroughly with damp cloth.",
+        "• Weekly: Vacuum grind chamber.",
+    ]
+
+
+def test_steps_become_bullets():
+    assert answer(AVOCADO_TOAST, "bullet").split("\n") == [
+        "• Step 1: Toast one thick slice of sourdough bread until golden brown.",
+        "• Step 2: Spread the mashed avocado evenly over the hot toast.",
+    ]
@@ -0,0 +1,42 @@
+# test_kai_store.py
+from kai_store import BufferedStore, SQLiteStore, SummaryView, stress_upvotes
+
+
+def open_store(tmp_path):
+    return SQLiteStore(str(tmp_path / "kai.db"), ideas_csv="", kudos_csv="")
+
+
+def test_summary_lists_first_kudos_once(tmp_path):
+    store = open_store(tmp_path)
+    store.add_kudos("a", "b", "before start")
+    view = SummaryView(store, k=5)
+    view.kudos_added(store.add_kudos("a", "b", "first after start"))
+    messages = [k["message"] for k in view.snapshot()["recent_kudos"]]
+    assert messages == ["before start", "first after start"]
+
+
+def test_summary_lists_kudos_once_after_refresh(tmp_path):
+    store = open_store(tmp_path)
+    view = SummaryView(store, k=5, refresh=60)
+    view.kudos_added(store.add_kudos("a", "b", "one"))
+    view.loaded_at -= 120   # KAI_SUMMARY_REFRESH has passed: the next write reloads
+    view.kudos_added(store.add_kudos("a", "b", "two"))
+    messages = [k["message"] for k in view.snapshot()["recent_kudos"]]
+    assert messages == ["one", "two"]
+
+
+def test_concurrent_upvotes_are_all_counted(tmp_path):
+    expected, actual = stress_upvotes(open_store(tmp_path), threads=8, votes=50)
+    assert actual == expected
+
+
+def test_concurrent_buffered_upvotes_are_all_written(tmp_path):
+    store = open_store(tmp_path)
+    buffered = BufferedStore(store, flush_size=25, flush_interval=0.01)
+    try:
+        expected, actual = stress_upvotes(buffered, threads=8, votes=50)
+        assert actual == expected   # read through the buffer (pending deltas included)
+    finally:
+        buffered.close()
+    idea = store.list_ideas()[0]
+    assert store.get_idea(idea["idea_id"])["upvotes"] == expected
@@ -0,0 +1,38 @@
+# test_vector_index.py
+from vector_index import compare_rankings
+
+
+def test_same_ranking_matches():
+    ranking = [("a", 0.1), ("b", 0.2), ("c", 0.3)]
+    assert compare_rankings(ranking, list(ranking))
+
+
+def test_tied_ids_may_swap():
+    expected = [("a", 0.1), ("b", 0.2), ("c", 0.2), ("d", 0.4)]
+    actual = [("a", 0.1), ("c", 0.2), ("b", 0.2), ("d", 0.4)]
+    assert compare_rankings(expected, actual)
+
+
+def test_different_id_at_last_rank_fails():
+    expected = [("a", 0.1), ("b", 0.2), ("c", 0.3)]
+    actual = [("a", 0.1), ("b", 0.2), ("x", 0.3)]
+    assert not compare_rankings(expected, actual)
+
+
+def test_tied_run_must_hold_the_same_ids():
+    # b / c are tied, but the numpy side returned another id in their run
+    expected = [("a", 0.1), ("b", 0.2), ("c", 0.2), ("d", 0.4)]
+    actual = [("a", 0.1), ("c", 0.2), ("x", 0.2), ("d", 0.4)]
+    assert not compare_rankings(expected, actual)
+
+
+def test_tied_run_cut_at_top_k_matches():
+    # b / c / x are all tied at 0.2: top_k=3 keeps a different one on each side
+    expected = [("a", 0.1), ("b", 0.2), ("c", 0.2)]
+    actual = [("a", 0.1), ("c", 0.2), ("x", 0.2)]
+    assert compare_rankings(expected, actual)
+
+
+def test_score_mismatch_fails():
+    assert not compare_rankings([("a", 0.1), ("b", 0.2)], [("a", 0.1), ("b", 0.25)])
+    assert not compare_rankings([("a", 0.1)], [("a", 0.1), ("b", 0.2)])
@@ -0,0 +1,170 @@
+# vector_index.py
+import json
+import os
+import sys
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+# default questions for the ranking check (python vector_index.py)
+CHECK_QUERIES = [
+    "How do I request a refund?",
+    "What is the refund policy for food and drinks?",
+    "How should I handle a customer complaint?",
+    "What are the cleanliness standards?",
+    "What do I do in an emergency?",
+    "How do I make avocado toast?",
+    "What are the opening procedures?",
+    "How do I clean the espresso machine?",
+]
+# ----------------------------------------
+
+
+class VectorIndex:
+    """
+    Exact cosine search over the exported chunk embeddings.
+    Built by data_ingest.py as <prefix>.npy (unit float32 rows, memory-mapped
+    on load) + <prefix>.json (ids, documents, metadatas); loaded once by arai_rag.
+    Scores use Chroma's l2 scale for unit vectors: 2 - 2*cosine (lower is better).
+    """
+
+    def __init__(self, ids, documents, metadatas, vectors):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.vectors = vectors            # (n, dim) float32, rows normalised
+        self.id_index = {doc_id: i for i, doc_id in enumerate(ids)}
+
+    @staticmethod
+    def _unit_rows(matrix):
+        m = np.asarray(matrix, dtype=np.float32)
+        if m.ndim == 1:
+            m = m[None, :]
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return m / norms
+
+    @classmethod
+    def build(cls, ids, embeddings, documents, metadatas):
+        vectors = cls._unit_rows(embeddings) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+        return cls(list(ids), list(documents), list(metadatas), vectors)
+
+    def save(self, prefix):
+        tmp = prefix + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, self.vectors)
+        os.replace(tmp, prefix + ".npy")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, prefix + ".json")
+
+    @classmethod
+    def load(cls, prefix):
+        with open(prefix + ".json", "r", encoding="utf-8") as f:
+            data = json.load(f)
+        vectors = np.load(prefix + ".npy", mmap_mode="r")
+        return cls(data["ids"], data["documents"], data["metadatas"], vectors)
+
+    def search(self, embedding, top_k=5, where=None):
+        """
+        Returns [(doc_idx, score)] best first, score = 2 - 2*cosine.
+        where: optional {metadata key: value} filter, like Chroma's.
+        """
+        return self.search_many([embedding], top_k=top_k, where=where)[0]
+
+    def search_many(self, embeddings, top_k=5, where=None):
+        """search() for several queries with one matrix product; one result list per query"""
+        if not self.ids:
+            return [[] for _ in embeddings]
+        sims = self._unit_rows(embeddings) @ self.vectors.T        # (queries, docs)
+        if where:
+            keep = np.array([
+                all((meta or {}).get(k) == v for k, v in where.items())
+                for meta in self.metadatas
+            ])
+            sims = np.where(keep, sims, -np.inf)
+            top_k = min(top_k, int(keep.sum()))
+        top_k = min(top_k, len(self.ids))
+        if top_k <= 0:
+            return [[] for _ in embeddings]
+        best = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+        results = []
+        for row, idx in zip(sims, best):
+            idx = idx[np.argsort(-row[idx], kind="stable")]
+            results.append([(int(i), float(2 - 2 * row[i])) for i in idx])
+        return results
+
+
+def compare_rankings(expected, actual, tolerance=1e-4):
+    """
+    expected / actual: [(id, score)] best first for one query.
+    Rankings match if the scores agree rank by rank and the ids only differ
+    in order within a run of tied scores (e.g. the same section in two manuals).
+    A tie run that reaches the last rank may go on past the top_k cutoff, so
+    either side can have cut it at different ids: it is compared by score only.
+    """
+    if len(expected) != len(actual):
+        return False
+    for (_, e_score), (_, a_score) in zip(expected, actual):
+        if abs(e_score - a_score) > tolerance:
+            return False
+    start = 0
+    for r in range(1, len(expected) + 1):
+        if r == len(expected) and r - start > 1:
+            break   # a tie run at the last rank, possibly cut at top_k
+        if r == len(expected) or abs(expected[r][1] - expected[start][1]) > tolerance:
+            # end of a tie run: same ids, any order
+            if {i for i, _ in expected[start:r]} != {i for i, _ in actual[start:r]}:
+                return False
+            start = r
+    return True
+
+
+def check_against_chroma(queries=None, top_k=5):
+    """
+    Run the same queries through Chroma and the exported index (arai_rag's
+    files, whichever backend it is configured with) and report per-query agreement.
+    """
+    import arai_rag
+
+    arai_rag.init()
+    index = arai_rag.vector_index or VectorIndex.load(arai_rag.VECTOR_INDEX_PREFIX)
+    collection = arai_rag.collection or arai_rag.open_chroma().get_collection(name=arai_rag.COLLECTION_NAME)
+    queries = queries or CHECK_QUERIES
+    embeddings = arai_rag.embedding_func(queries)
+    res = collection.query(
+        query_embeddings=[[float(x) for x in e] for e in embeddings],
+        n_results=top_k,
+        include=["distances"]
+    )
+
+    results = []
+    for q, emb, ids, dists in zip(queries, embeddings, res["ids"], res["distances"]):
+        expected = list(zip(ids, dists))
+        actual = [(index.ids[i], s) for i, s in index.search(emb, top_k=top_k)]
+        results.append({
+            "query": q,
+            "match": compare_rankings(expected, actual),
+            "chroma": [i for i, _ in expected],
+            "numpy": [i for i, _ in actual],
+        })
+    return {
+        "queries": len(results),
+        "matched": sum(r["match"] for r in results),
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    # python vector_index.py ["question" ...]  -> compares rankings with Chroma
+    report = check_against_chroma(sys.argv[1:] or None)
+    for r in report["results"]:
+        print(f"{'✅' if r['match'] else '❌'} {r['query']}")
+        if not r["match"]:
+            print(f"   chroma: {r['chroma']}\n   numpy:  {r['numpy']}")
+    print(f"{report['matched']}/{report['queries']} queries rank the same")
+    sys.exit(0 if report["matched"] == report["queries"] else 1)